@@ -1,8 +1,12 @@
-from transformers import pipeline
-from gtts import gTTS
-import nltk
-from nltk.tokenize import sent_tokenize
+import io
 import os
+import re
+import argparse
+import itertools
+from SmartBlogAudioSummarizerAudio import iter_segments, segment_text, stream_mp3
+from SmartBlogAudioSummarizerBackends import DEFAULT_PRESET, PRESETS, get_backend, get_preset
+from SmartBlogAudioSummarizerCache import AudioCache, SummaryCache
+from SmartBlogAudioSummarizerText import content_key, get_document
 
 """
 Install the required packages:
@@ -19,6 +23,9 @@ Pass your blog post text to create a summary
 Generate audio files for both the full post and summary
 Upload the generated MP3 files to your blog's media library
 
+Pick a generation preset for speed or quality (fast, balanced or quality):
+python SmartBlogAudioSummarizer.py --preset fast
+
 Would you like me to explain any specific part of the implementation 
 or help you integrate it with your particular blog platform? I can also 
 help you modify the code to work with different summarization models or 
@@ -26,14 +33,44 @@ audio generation services if you have specific preferences.
 
 
 """
+# Safety cap on summarize-the-summaries passes when reducing
+MAX_REDUCE_LEVELS = 6
+
 class BlogEnhancer:
-    def __init__(self):
-        # Initialize the summarization pipeline
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        # Download required NLTK data
-        nltk.download('punkt')
+    def __init__(self, batch_size=8, max_chunk_tokens=1024, chunk_overlap=0, summary_cache=None,
+                 audio_cache=None, tts_concurrency=4, tts_retries=2, backend=None, preset=None):
+        # Number of chunks sent to the model per generate call
+        self.batch_size = batch_size
+        # Token budget per chunk (BART's context window) and sentences shared between chunks
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        # Optional SummaryCache consulted per chunk before running the model
+        self.summary_cache = summary_cache
+        # Optional AudioCache consulted per text segment before calling the TTS service
+        self.audio_cache = audio_cache
+        # Segments synthesized at once, and retries per failed segment
+        self.tts_concurrency = tts_concurrency
+        self.tts_retries = tts_retries
+        # The summarization pipeline is created lazily by the summarizer property
+        self.backend = backend or get_backend('bart')
+        self.model_name = self.backend.cache_name
+        self._summarizer = None
+        # Beam search settings and per-chunk summary budgets, see GenerationPreset
+        self.preset = preset or get_preset()
+    
+    @property
+    def summarizer(self):
+        """
+        The summarization pipeline, loaded on first use
+        
+        Loading BART takes several seconds and over a gigabyte of memory, so it
+        is deferred until something actually needs to be summarized.
+        """
+        if self._summarizer is None:
+            self._summarizer = self.backend.load()
+        return self._summarizer
     
-    def create_summary(self, text, max_length=150, min_length=50):
+    def create_summary(self, text, max_length=150, min_length=50, reduce=False, target_length=None):
         """
         Create a summary of the blog post text
         
@@ -41,24 +78,160 @@ class BlogEnhancer:
             text (str): The blog post content
             max_length (int): Maximum length of summary in words
             min_length (int): Minimum length of summary in words
+            reduce (bool): Summarize the chunk summaries until they fit target_length
+            target_length (int): Maximum summary length in tokens when reducing
+                (default: max_length)
             
         Returns:
             str: Summarized text
         """
+        return self.create_summaries([text], max_length, min_length, reduce, target_length)[0]
+    
+    def create_summaries(self, texts, max_length=150, min_length=50, reduce=False, target_length=None):
+        """
+        Create summaries for several blog posts, batching chunks across posts
+        
+        Args:
+            texts (list): Blog post contents
+            max_length (int): Maximum length of each summary in words
+            min_length (int): Minimum length of each summary in words
+            reduce (bool): Summarize the chunk summaries until they fit target_length
+            target_length (int): Maximum summary length in tokens when reducing
+                (default: max_length)
+            
+        Returns:
+            list: Summarized text for each post, in input order
+        """
         # Ensure text isn't too long for the model
-        chunks = self._chunk_text(text)
+        chunked = [self._chunk_text(text) for text in texts]
+        summaries = self._summarize_posts(chunked, max_length, min_length)
+        if not reduce:
+            return summaries
+        
+        if target_length is None:
+            target_length = max_length
+        
+        # Re-chunk and summarize the joined summaries, one batched pass per level
+        for _ in range(MAX_REDUCE_LEVELS):
+            pending = [i for i, summary in enumerate(summaries)
+                       if self._count_tokens(summary) > target_length]
+            if not pending:
+                break
+            
+            rechunked = {i: self._chunk_text(summaries[i]) for i in pending}
+            # Posts down to a single chunk are summarized straight to the target length
+            final = [i for i in pending if len(rechunked[i]) == 1]
+            intermediate = [i for i in pending if len(rechunked[i]) > 1]
+            
+            for posts, level_max, level_min in (
+                    (final, target_length, min(min_length, target_length // 2)),
+                    (intermediate, max_length, min_length)):
+                reduced = self._summarize_posts([rechunked[i] for i in posts], level_max, level_min)
+                for i, summary in zip(posts, reduced):
+                    summaries[i] = summary
+        
+        return summaries
+    
+    def _summarize_posts(self, chunked, max_length, min_length):
+        """
+        Summarize the chunks of several posts in one batched pass
+        
+        Args:
+            chunked (list): List of chunk lists, one per post
+            max_length (int): Maximum length of each chunk summary
+            min_length (int): Minimum length of each chunk summary
+            
+        Returns:
+            list: Joined chunk summaries for each post
+        """
+        flat_chunks = [chunk for chunks in chunked for chunk in chunks]
+        flat_summaries = self._summarize_chunks(flat_chunks, max_length, min_length)
+        
         summaries = []
+        position = 0
+        for chunks in chunked:
+            summaries.append(" ".join(flat_summaries[position:position + len(chunks)]))
+            position += len(chunks)
+        
+        return summaries
+    
+    def _summarize_chunks(self, chunks, max_length, min_length):
+        """
+        Summarize chunks in batches of similar token length
+        
+        Args:
+            chunks (list): Text chunks that fit the model's input window
+            max_length (int): Maximum length of each chunk summary
+            min_length (int): Minimum length of each chunk summary
+            
+        Returns:
+            list: Summary of each chunk, in input order
+        """
+        if not chunks:
+            return []
+        
+        generate_kwargs = self.preset.generate_kwargs
+        summaries = [None] * len(chunks)
+        
+        # Reuse cached summaries and only run the model on the remaining chunks
+        keys = None
+        if self.summary_cache is not None:
+            keys = [self.summary_cache.make_key(content_key(chunk), self.model_name, max_length, min_length,
+                                                **self.preset.cache_params)
+                    for chunk in chunks]
+            cached = self.summary_cache.get_many(keys)
+            for i, key in enumerate(keys):
+                summaries[i] = cached.get(key)
+        todo = [i for i in range(len(chunks)) if summaries[i] is None]
+        if not todo:
+            return summaries
         
-        for chunk in chunks:
-            summary = self.summarizer(chunk, 
-                                    max_length=max_length, 
-                                    min_length=min_length, 
-                                    do_sample=False)[0]['summary_text']
-            summaries.append(summary)
+        # Each chunk's summary budget follows its token count
+        lengths = [len(ids) for ids in self.summarizer.tokenizer([chunks[i] for i in todo])['input_ids']]
+        token_counts = dict(zip(todo, lengths))
+        budgets = {i: self.preset.budget(token_counts[i], max_length, min_length) for i in todo}
+        # A chunk already no longer than its summary could be is kept as it is
+        short = [i for i in todo if self.preset.length_ratio is not None and token_counts[i] <= budgets[i][0]]
+        for i in short:
+            summaries[i] = ' '.join(chunks[i].split())
+        if keys is not None and short:
+            self.summary_cache.put_many({keys[i]: summaries[i] for i in short})
         
-        return " ".join(summaries)
+        # Batch chunks with the same budget, sorted by token length so each batch pads to roughly the same size
+        order = sorted((i for i in todo if summaries[i] is None), key=lambda i: (budgets[i], token_counts[i]))
+        batches = []
+        for budget, group in itertools.groupby(order, key=budgets.get):
+            group = list(group)
+            batches.extend((budget, group[start:start + self.batch_size])
+                           for start in range(0, len(group), self.batch_size))
+        
+        for (batch_max, batch_min), batch in batches:
+            outputs = self.summarizer([chunks[i] for i in batch],
+                                      max_length=batch_max,
+                                      min_length=batch_min,
+                                      truncation=True,
+                                      batch_size=len(batch),
+                                      **generate_kwargs)
+            for i, output in zip(batch, outputs):
+                summaries[i] = output['summary_text']
+            if keys is not None:
+                self.summary_cache.put_many({keys[i]: summaries[i] for i in batch})
+        
+        return summaries
+
+    def _count_tokens(self, text):
+        """
+        Count the summarizer tokens in a piece of text
+        
+        Args:
+            text (str): Text to measure
+            
+        Returns:
+            int: Number of tokens, excluding special tokens
+        """
+        return len(self.summarizer.tokenizer.encode(text, add_special_tokens=False))
     
-    def create_audio(self, text, output_path, lang='en'):
+    def create_audio(self, text, output_path, lang='en', sink=None):
         """
         Convert text to speech and save as MP3
         
@@ -66,52 +239,203 @@ class BlogEnhancer:
             text (str): Text to convert to speech
             output_path (str): Path to save the audio file
             lang (str): Language code (default: 'en' for English)
+            sink (file): Binary file-like object to also stream the audio to as it is made
             
         Returns:
             str: Path to the generated audio file
         """
-        tts = gTTS(text=text, lang=lang, slow=False)
-        tts.save(output_path)
+        for _ in self.stream_audio(text, output_path, lang, sink):
+            pass
         return output_path
     
-    def _chunk_text(self, text, max_chars=1000):
+    def stream_audio(self, text, output_path=None, lang='en', sink=None):
+        """
+        Convert text to speech, yielding MP3 audio as soon as each segment is ready
+        
+        Args:
+            text (str): Text to convert to speech
+            output_path (str): Path to also save the audio file to, or None
+            lang (str): Language code (default: 'en' for English)
+            sink (file): Binary file-like object to copy the audio to (e.g. stdout)
+            
+        Yields:
+            bytes: MP3 frames for each segment, in playback order
+        """
+        segments = segment_text(text)
+        if not segments:
+            raise ValueError("No text to convert to speech")
+        
+        # Synthesize per segment, several at a time, so an edited post only
+        # re-synthesizes the changed parts and long posts finish sooner
+        parts = iter_segments(segments, lambda segment: self._segment_audio(segment, lang),
+                              self.tts_concurrency, self.tts_retries)
+        yield from stream_mp3(parts, output_path, sink)
+    
+    def _segment_audio(self, segment, lang):
+        """
+        Synthesize one text segment, reusing cached audio when available
+        
+        Args:
+            segment (str): Text segment
+            lang (str): Language code
+            
+        Returns:
+            bytes: MP3 data for the segment
+        """
+        key = None
+        if self.audio_cache is not None:
+            key = self.audio_cache.make_key(content_key(segment), engine='gtts', lang=lang, slow=False)
+            data = self.audio_cache.get(key)
+            if data is not None:
+                return data
+        
+        data = self._synthesize(segment, lang)
+        if key is not None:
+            self.audio_cache.put(key, data)
+        return data
+    
+    def _synthesize(self, segment, lang):
+        """
+        Call the TTS service for one text segment
+        
+        Args:
+            segment (str): Text segment
+            lang (str): Language code
+            
+        Returns:
+            bytes: MP3 data for the segment
+        """
+        from gtts import gTTS
+        
+        buffer = io.BytesIO()
+        gTTS(text=segment, lang=lang, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _chunk_text(self, text, max_tokens=None, overlap=None):
         """
-        Split text into smaller chunks for processing
+        Split text into sentence-aligned chunks that fill the model's token budget
         
         Args:
             text (str): Text to split
-            max_chars (int): Maximum characters per chunk
+            max_tokens (int): Maximum tokens per chunk, including special tokens
+                (default: self.max_chunk_tokens)
+            overlap (int): Number of trailing sentences repeated at the start of
+                the next chunk (default: self.chunk_overlap)
             
         Returns:
             list: List of text chunks
         """
-        sentences = sent_tokenize(text)
+        tokenizer = self.summarizer.tokenizer
+        if max_tokens is None:
+            max_tokens = self.max_chunk_tokens
+        if overlap is None:
+            overlap = self.chunk_overlap
+        # Leave room for the special tokens the model adds around every input
+        budget = max_tokens - tokenizer.num_special_tokens_to_add()
+        
+        # Sentences come from the shared index, so a post is only run through Punkt once
+        document = get_document(text)
+        if not len(document):
+            return []
+        
+        # Count each sentence with the leading space it gets once joined
+        lengths = [len(ids) for ids in tokenizer([" " + sentence for sentence in document],
+                                                 add_special_tokens=False)['input_ids']]
+        # Units are (start, end, tokens, sentence index); pieces of split sentences have no index
+        units = []
+        for index, length in enumerate(lengths):
+            if length <= budget:
+                units.append((document.starts[index], document.ends[index], length, index))
+            else:
+                units.extend(self._split_sentence(document, index, budget))
+        
         chunks = []
         current_chunk = []
         current_length = 0
         
-        for sentence in sentences:
-            if current_length + len(sentence) <= max_chars:
-                current_chunk.append(sentence)
-                current_length += len(sentence)
-            else:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-                current_length = len(sentence)
+        for position, unit in enumerate(units):
+            length = unit[2]
+            if current_chunk and current_length + length > budget:
+                chunks.append(self._passage(document, [units[i] for i in current_chunk]))
+                # Repeat the last few sentences for context, as long as they leave room
+                current_chunk = current_chunk[-overlap:] if overlap > 0 else []
+                current_length = sum(units[i][2] for i in current_chunk)
+                while current_chunk and current_length + length > budget:
+                    current_length -= units[current_chunk.pop(0)][2]
+            current_chunk.append(position)
+            current_length += length
         
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            chunks.append(self._passage(document, [units[i] for i in current_chunk]))
             
         return chunks
 
+    def _split_sentence(self, document, index, budget):
+        """
+        Split a sentence that does not fit the token budget on word boundaries
+        
+        Args:
+            document (Document): The text's sentence index
+            index (int): Index of the sentence
+            budget (int): Maximum tokens per piece
+            
+        Returns:
+            list: (start, end, tokens, None) pieces that fit the budget
+        """
+        start, end = document.starts[index], document.ends[index]
+        words = [match.span() for match in re.finditer(r'\S+', document.text[start:end])]
+        lengths = [len(ids) for ids in self.summarizer.tokenizer(
+            [" " + document.text[start + word_start:start + word_end] for word_start, word_end in words],
+            add_special_tokens=False)['input_ids']]
+        pieces = []
+        piece_start = None
+        current_length = 0
+        
+        # A single word longer than the budget is left whole; the pipeline truncates it
+        for (word_start, word_end), length in zip(words, lengths):
+            if piece_start is not None and current_length + length > budget:
+                pieces.append((piece_start, piece_end, current_length, None))
+                piece_start = None
+                current_length = 0
+            if piece_start is None:
+                piece_start = start + word_start
+            piece_end = start + word_end
+            current_length += length
+        
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, current_length, None))
+        
+        return pieces
+    
+    def _passage(self, document, units):
+        """
+        Join consecutive units into one slice of the document's text
+        
+        Args:
+            document (Document): The text's sentence index
+            units (list): (start, end, tokens, sentence index) tuples
+            
+        Returns:
+            str: A Passage keyed by its sentences, or a plain slice if it holds part of one
+        """
+        if all(unit[3] is not None for unit in units):
+            return document.passage(units[0][3], units[-1][3] + 1)
+        return document.text[units[0][0]:units[-1][1]]
+
 def main():
+    parser = argparse.ArgumentParser(description='Summarize and voice an example blog post')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                       help='Generation speed/quality preset: beams, length penalty and summary budgets')
+    args = parser.parse_args()
+    
     # Example usage
     blog_post = """
     Your blog post content goes here. This can be a long article
     that you want to summarize and convert to audio.
     """
     
-    enhancer = BlogEnhancer()
+    enhancer = BlogEnhancer(summary_cache=SummaryCache(), audio_cache=AudioCache(),
+                            preset=get_preset(args.preset))
     
     # Create summary
     summary = enhancer.create_summary(blog_post)
@@ -0,0 +1,467 @@
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from SmartBlogAudioSummarizerText import get_document
+
+"""
+Audio helpers shared by the Smart Blog Audio Summarizer scripts.
+
+Long texts are synthesized as a series of sentence-group segments that are
+cached individually and stitched back into one MP3. Segment boundaries are
+content-defined: a segment ends after a sentence whose hash matches a fixed
+pattern (once the segment is long enough), so editing one paragraph only
+changes the segments around it instead of shifting every later boundary.
+
+Segments are synthesized concurrently (bounded by a concurrency limit, with
+per-segment retries) and joined on MPEG frame boundaries: tags and the
+Xing/Info header frame that only describes the first segment are dropped,
+as are partial frames, so players see one continuous stream.
+
+iter_segments/aiter_segments and stream_mp3 hand each segment on as soon as
+it and the ones before it are ready, for callers that want to start playing
+(or sending) audio before the whole text has been synthesized.
+
+Pauses are planned on the text before synthesis: mark_pauses splits text
+into phrases that each end with a break duration taken from the punctuation
+class that closes them. Edge TTS escapes SSML, so a <break> tag cannot be
+sent to it; instead each phrase is synthesized on its own and silent frames
+(cloned from the phrase's own frame header) are spliced in after it. Every
+phrase starts a fresh encoder stream, so the splice never disturbs the
+bit reservoir of the frames that follow. The voices already pause after
+punctuation, so text is only cut where a break is longer than that
+(NATURAL_PAUSES), and only the difference is spliced in; the text between
+cuts is grouped into segments as usual. Breaks at or below the natural
+pause change nothing.
+"""
+
+# Segment size bounds in characters
+MIN_SEGMENT_CHARS = 400
+MAX_SEGMENT_CHARS = 2000
+# On average one sentence in BOUNDARY_DIVISOR ends a segment once past the minimum
+BOUNDARY_DIVISOR = 4
+
+# MPEG audio Layer III bitrates (kbit/s) and sample rates (Hz) by header index
+_BITRATES = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Punctuation that closes each pause class, and the default break after it in milliseconds
+PAUSE_CLASSES = {
+    'sentence': '.!?',
+    'clause': ',;:',
+}
+DEFAULT_BREAKS = {'sentence': 300, 'clause': 200}
+# Pause the voices leave on their own after each class; shorter breaks need no silence
+NATURAL_PAUSES = {'sentence': 300, 'clause': 200}
+
+
+def segment_text(text, min_chars=MIN_SEGMENT_CHARS, max_chars=MAX_SEGMENT_CHARS):
+    """
+    Split text into sentence groups with edit-stable boundaries
+
+    Args:
+        text (str): Text to split
+        min_chars (int): Minimum segment length before a content boundary is accepted
+        max_chars (int): Segment length at which a boundary is forced
+
+    Returns:
+        list: List of text segments (Passages of the text's Document)
+    """
+    document = get_document(text)
+    segments = []
+    first = 0
+    current_length = 0
+
+    for index in range(len(document)):
+        current_length += document.ends[index] - document.starts[index] + 1
+        if current_length >= max_chars or (
+                current_length >= min_chars and _is_boundary(document.digest(index))):
+            segments.append(document.passage(first, index + 1))
+            first = index + 1
+            current_length = 0
+
+    if first < len(document):
+        segments.append(document.passage(first, len(document)))
+
+    return segments
+
+
+def mark_pauses(text, breaks=None, max_chars=MAX_SEGMENT_CHARS):
+    """
+    Split text into phrases, each followed by the silence still needed after it
+
+    Text is only cut after a sentence (or clause) whose break is longer than
+    the pause the voice leaves there anyway (NATURAL_PAUSES), and the silence
+    is the break minus that natural pause. The text between
+    cuts is grouped like segment_text, so with the default breaks this is
+    segment_text with zero pauses and every request stays segment-sized.
+
+    Args:
+        text (str): Text to split
+        breaks (dict): Break in milliseconds per pause class ('sentence', 'clause')
+        max_chars (int): Phrase length at which a cut is forced
+
+    Returns:
+        list: (phrase, silence to add in milliseconds) tuples; the last silence is always 0
+    """
+    breaks = dict(DEFAULT_BREAKS, **(breaks or {}))
+    # Only the part of a break the voice would not make by itself is spliced in
+    breaks = {name: pause - NATURAL_PAUSES.get(name, 0) for name, pause in breaks.items()
+              if pause > NATURAL_PAUSES.get(name, 0)}
+    if not breaks:
+        return [(segment, 0) for segment in segment_text(text, max_chars=max_chars)]
+
+    # Pieces as (start, end, sentence index), with no index for part of a sentence
+    document = get_document(text)
+    pieces = []
+    for index in range(len(document)):
+        start, end = document.starts[index], document.ends[index]
+        clauses = list(re.finditer(r'\S.*?(?:[,;:](?=\s)|$)', text[start:end], re.S)) if breaks.get('clause') else []
+        if len(clauses) > 1:
+            pieces.extend((start + clause.start(), start + clause.end(), None) for clause in clauses)
+        else:
+            pieces.append((start, end, index))
+
+    phrases = []
+    current_phrase = []
+    for piece in pieces:
+        current_phrase.append(piece)
+        last_mark = text[piece[0]:piece[1]].rstrip('"\')]\u201d\u2019')[-1:]
+        pause = next((breaks.get(name, 0) for name, marks in PAUSE_CLASSES.items() if last_mark in marks), 0)
+        if pause:
+            phrases.extend(_group(document, current_phrase, pause, max_chars))
+            current_phrase = []
+
+    if current_phrase:
+        phrases.extend(_group(document, current_phrase, 0, max_chars))
+    if phrases:
+        phrases[-1] = (phrases[-1][0], 0)
+
+    return phrases
+
+
+def _group(document, pieces, pause, max_chars):
+    """Group the pieces between two cuts into segments; only the last one is followed by the pause"""
+    segments = segment_text(_phrase(document, pieces), max_chars=max_chars)
+    return [(segment, pause if i == len(segments) - 1 else 0) for i, segment in enumerate(segments)]
+
+
+def _phrase(document, pieces):
+    """Join consecutive pieces into one slice of the document's text"""
+    if all(index is not None for _, _, index in pieces):
+        return document.passage(pieces[0][2], pieces[-1][2] + 1)
+    return document.text[pieces[0][0]:pieces[-1][1]]
+
+
+def _is_boundary(digest):
+    """Decide from the sentence content alone (its hash) whether a segment may end here"""
+    return int.from_bytes(digest[:4], 'big') % BOUNDARY_DIVISOR == 0
+
+
+def strip_tags(data):
+    """
+    Remove ID3v2 and ID3v1 tags so MP3 segments can be concatenated
+
+    Args:
+        data (bytes): MP3 file contents
+
+    Returns:
+        bytes: The bare MPEG audio frames
+    """
+    if data[:3] == b'ID3' and len(data) >= 10:
+        # Tag size is a 28-bit "syncsafe" integer, excluding the 10-byte header
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+
+def parse_frame_header(data, offset=0):
+    """
+    Parse the MPEG audio Layer III frame header at an offset
+
+    Args:
+        data (bytes): MP3 data
+        offset (int): Position of the candidate frame header
+
+    Returns:
+        dict: Frame length in bytes, samples per frame, sample rate and channel
+            mode, or None if there is no valid Layer III header at the offset
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0x03
+    # Version 1 is reserved, layer 1 means Layer III; free-format and invalid bitrates are rejected
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _BITRATES['mpeg1' if version == 3 else 'mpeg2'][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (data[offset + 2] >> 1) & 0x01
+    samples = 1152 if version == 3 else 576
+    return {
+        'length': samples // 8 * bitrate // sample_rate + padding,
+        'samples': samples,
+        'sample_rate': sample_rate,
+        'mono': (data[offset + 3] >> 6) == 3,
+    }
+
+
+def audio_frames(data):
+    """
+    Cut MP3 data down to its complete audio frames
+
+    Tags, any bytes before the first frame, a leading Xing/Info/VBRI header
+    frame and a truncated last frame are removed, so the result can be
+    concatenated with other segments without glitches.
+
+    Args:
+        data (bytes): MP3 file contents
+
+    Returns:
+        bytes: Complete MPEG audio frames only
+    """
+    data = strip_tags(data)
+    start = 0
+    while parse_frame_header(data, start) is None:
+        start = data.find(b'\xff', start + 1)
+        if start < 0:
+            # Not Layer III audio we understand; pass it through untouched
+            return data
+
+    header = parse_frame_header(data, start)
+    first_frame = data[start:start + header['length']]
+    if b'Xing' in first_frame[:48] or b'Info' in first_frame[:48] or first_frame[36:40] == b'VBRI':
+        start += header['length']
+
+    end = start
+    while True:
+        header = parse_frame_header(data, end)
+        if header is None or end + header['length'] > len(data):
+            break
+        end += header['length']
+    return data[start:end]
+
+
+def iter_segments(segments, synthesize, concurrency=4, retries=2, backoff=1.0):
+    """
+    Synthesize segments concurrently with a blocking TTS function, yielding them in order
+
+    Each segment is yielded as soon as it and every segment before it are
+    done, so playback can start after the first one instead of the last.
+
+    Args:
+        segments (list): Text segments
+        synthesize (callable): Function turning one segment into MP3 bytes
+        concurrency (int): Maximum segments synthesized at once
+        retries (int): Extra attempts per segment after a failure
+        backoff (float): Seconds before the first retry, doubled for each further retry
+
+    Yields:
+        bytes: MP3 data for each segment, in input order
+    """
+    def attempt(segment):
+        for retry in range(retries + 1):
+            try:
+                return synthesize(segment)
+            except Exception:
+                if retry == retries:
+                    raise
+                time.sleep(backoff * 2 ** retry)
+
+    if concurrency <= 1 or len(segments) <= 1:
+        for segment in segments:
+            yield attempt(segment)
+        return
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    futures = [executor.submit(attempt, segment) for segment in segments]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # Stop queued segments if the consumer goes away early (e.g. a closed connection)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def silence(reference, duration_ms):
+    """
+    Make silent MP3 frames that match the format of some reference audio
+
+    The reference's first frame header is reused (without CRC or padding) with
+    an all-zero body: zero side information means no coded spectral data, which
+    every decoder plays back as silence.
+
+    Args:
+        reference (bytes): MP3 data the silence will be joined to
+        duration_ms (int): Length of the silence in milliseconds
+
+    Returns:
+        bytes: Silent frames, or b'' if the reference has no frames to copy
+    """
+    data = audio_frames(reference)
+    if duration_ms <= 0 or parse_frame_header(data, 0) is None:
+        return b''
+    header = bytearray(data[:4])
+    header[1] |= 0x01  # protection bit set: no CRC follows
+    header[2] &= ~0x02  # no padding byte
+    info = parse_frame_header(header, 0)
+    frame = bytes(header) + bytes(info['length'] - 4)
+    count = round(duration_ms * info['sample_rate'] / info['samples'] / 1000)
+    return frame * count
+
+
+def synthesize_segments(segments, synthesize, concurrency=4, retries=2, backoff=1.0):
+    """
+    Synthesize segments concurrently with a blocking TTS function
+
+    Returns:
+        list: MP3 data for each segment, in input order
+    """
+    return list(iter_segments(segments, synthesize, concurrency, retries, backoff))
+
+
+async def aiter_segments(segments, synthesize, concurrency=4, retries=2, backoff=1.0):
+    """
+    Synthesize segments concurrently with an async TTS function, yielding them in order
+
+    Args:
+        segments (list): Text segments
+        synthesize (callable): Coroutine function turning one segment into MP3 bytes
+        concurrency (int): Maximum segments synthesized at once
+        retries (int): Extra attempts per segment after a failure
+        backoff (float): Seconds before the first retry, doubled for each further retry
+
+    Yields:
+        bytes: MP3 data for each segment, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def attempt(segment):
+        async with semaphore:
+            for retry in range(retries + 1):
+                try:
+                    return await synthesize(segment)
+                except Exception:
+                    if retry == retries:
+                        raise
+                    await asyncio.sleep(backoff * 2 ** retry)
+
+    tasks = [asyncio.ensure_future(attempt(segment)) for segment in segments]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def asynthesize_segments(segments, synthesize, concurrency=4, retries=2, backoff=1.0):
+    """
+    Synthesize segments concurrently with an async TTS function
+
+    Returns:
+        list: MP3 data for each segment, in input order
+    """
+    return [data async for data in aiter_segments(segments, synthesize, concurrency, retries, backoff)]
+
+
+class Mp3Writer:
+    def __init__(self, output_path=None, sink=None):
+        """
+        Append MP3 segments to a file and/or a sink as they arrive
+
+        The file is written as output_path + '.part' and only replaces
+        output_path on close(), so output_path itself is never half-written.
+
+        Args:
+            output_path (str): Path to save the audio file, or None to only stream
+            sink (file): Binary file-like object to copy the audio to (e.g. stdout)
+        """
+        self.output_path = output_path
+        self.sink = sink
+        self.temp_path = output_path + '.part' if output_path else None
+        self._file = open(self.temp_path, 'wb') if self.temp_path else None
+
+    def write(self, data):
+        """
+        Append one segment
+
+        Args:
+            data (bytes): MP3 data for the segment
+
+        Returns:
+            bytes: The segment's audio frames, as written
+        """
+        frames = audio_frames(data)
+        if self._file is not None:
+            self._file.write(frames)
+            self._file.flush()
+        if self.sink is not None:
+            self.sink.write(frames)
+            if hasattr(self.sink, 'flush'):
+                self.sink.flush()
+        return frames
+
+    def close(self):
+        """Finish the file and move it into place"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        """Discard the partial file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.temp_path)
+
+
+def stream_mp3(parts, output_path=None, sink=None):
+    """
+    Stitch MP3 segments into one stream as they arrive
+
+    Args:
+        parts (iterable): MP3 data for each segment, in playback order
+        output_path (str): Path to save the audio file, or None to only stream
+        sink (file): Binary file-like object to copy the audio to (e.g. stdout)
+
+    Yields:
+        bytes: The audio frames of each segment
+    """
+    writer = Mp3Writer(output_path, sink)
+    try:
+        for data in parts:
+            yield writer.write(data)
+    except BaseException:
+        # Includes the consumer closing the generator early
+        writer.abort()
+        raise
+    writer.close()
+
+
+def write_mp3(parts, output_path):
+    """
+    Stitch MP3 segments into one file, replacing output_path atomically
+
+    Args:
+        parts (iterable): MP3 data for each segment, in playback order
+        output_path (str): Path to save the audio file
+
+    Returns:
+        str: Path to the generated audio file
+    """
+    for _ in stream_mp3(parts, output_path):
+        pass
+    return output_path
@@ -0,0 +1,409 @@
+import argparse
+import collections
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from SmartBlogAudioSummarizerCache import DEFAULT_CACHE_DIR
+
+"""
+Pluggable summarization backends for the Smart Blog Audio Summarizer scripts.
+
+All backends run on CPU and return a transformers summarization pipeline:
+
+bart          facebook/bart-large-cnn, the original model
+distilbart    sshleifer/distilbart-cnn-12-6, same encoder and half the decoder
+distilbart-6  sshleifer/distilbart-cnn-6-6, half the encoder and decoder
+bart-int8     bart-large-cnn with its Linear layers dynamically quantized to int8
+onnx          bart-large-cnn exported to ONNX and run with ONNX Runtime
+              (needs: pip install optimum[onnxruntime]); the export is kept
+              under the cache directory so it only happens once
+
+Each backend has its own cache name, so cached summaries from one backend
+are never served for another.
+
+Generation presets trade summary quality for speed:
+
+original  bart-large-cnn's own settings (4 beams, its length penalty) and
+          the fixed summary lengths, as before presets (the default)
+fast      greedy decoding (1 beam), summaries up to 15% of each chunk's tokens
+balanced  2 beams, up to 20% of each chunk's tokens
+quality   4 beams with bart-large-cnn's length penalty, up to 25%
+
+Except with original, every chunk gets its own length budget in proportion
+to its token count, capped by the requested max_length, so a short trailing
+chunk is no longer forced to produce min_length tokens.
+
+Compare the backends on a directory of .txt posts; the first backend is the
+baseline that the others are scored against with ROUGE:
+python SmartBlogAudioSummarizerBackends.py corpus/ --backends bart,distilbart,bart-int8,onnx
+python SmartBlogAudioSummarizerBackends.py corpus/ --backends bart,distilbart --preset fast
+
+Every backend runs in a fresh process, so the peak memory reported is its own.
+"""
+
+ONNX_EXPORT_DIR = os.path.join(DEFAULT_CACHE_DIR, 'onnx')
+
+# Smallest summary budget, and the step budgets are rounded up to so that
+# chunks of similar size share a budget (and a generate call)
+MIN_SUMMARY_TOKENS = 16
+BUDGET_STEP = 16
+
+
+class SummarizerBackend:
+    name = None
+    model_name = "facebook/bart-large-cnn"
+
+    @property
+    def cache_name(self):
+        """Identifies the backend's output in summary cache keys"""
+        return self.model_name
+
+    def load(self):
+        """
+        Load the model
+
+        Returns:
+            Pipeline: A transformers summarization pipeline
+        """
+        from transformers import pipeline
+        return pipeline("summarization", model=self.model_name)
+
+
+class BartBackend(SummarizerBackend):
+    name = 'bart'
+
+
+class DistilBartBackend(SummarizerBackend):
+    name = 'distilbart'
+    model_name = "sshleifer/distilbart-cnn-12-6"
+
+
+class SmallDistilBartBackend(SummarizerBackend):
+    name = 'distilbart-6'
+    model_name = "sshleifer/distilbart-cnn-6-6"
+
+
+class QuantizedBartBackend(SummarizerBackend):
+    name = 'bart-int8'
+
+    @property
+    def cache_name(self):
+        return self.model_name + '+int8'
+
+    def load(self):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+        # Weights of every Linear layer stored as int8; activations are quantized on the fly
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+class OnnxBartBackend(SummarizerBackend):
+    name = 'onnx'
+
+    @property
+    def cache_name(self):
+        return self.model_name + '+onnx'
+
+    def load(self):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError("The onnx backend needs: pip install optimum[onnxruntime]") from e
+        from transformers import AutoTokenizer, pipeline
+
+        export_dir = os.path.join(ONNX_EXPORT_DIR, self.model_name.replace('/', '--'))
+        if os.path.isdir(export_dir):
+            model = ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+        else:
+            model = ORTModelForSeq2SeqLM.from_pretrained(self.model_name, export=True)
+            model.save_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+BACKENDS = {
+    'bart': BartBackend,
+    'distilbart': DistilBartBackend,
+    'distilbart-6': SmallDistilBartBackend,
+    'bart-int8': QuantizedBartBackend,
+    'onnx': OnnxBartBackend,
+}
+
+
+def get_backend(name='bart'):
+    """
+    Create a summarization backend
+
+    Args:
+        name (str): One of BACKENDS
+
+    Returns:
+        SummarizerBackend: The backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown summarizer backend: {name!r}")
+    return BACKENDS[name]()
+
+
+class GenerationPreset:
+    def __init__(self, name, num_beams, length_penalty, no_repeat_ngram_size, early_stopping, length_ratio):
+        """
+        Args:
+            name (str): Preset name
+            num_beams (int): Beams searched per chunk (1 is greedy decoding)
+            length_penalty (float): Exponent on summary length when scoring beams; above 1 favours longer ones
+            no_repeat_ngram_size (int): Size of n-grams that may not repeat within a summary
+            early_stopping (bool): Stop beam search once num_beams finished candidates are found
+            length_ratio (float): Summary budget as a fraction of the chunk's tokens, or None
+                for the fixed max_length/min_length of every chunk
+        """
+        self.name = name
+        self.num_beams = num_beams
+        self.length_penalty = length_penalty
+        self.no_repeat_ngram_size = no_repeat_ngram_size
+        self.early_stopping = early_stopping
+        self.length_ratio = length_ratio
+
+    @property
+    def generate_kwargs(self):
+        """Generation parameters passed to the summarization pipeline"""
+        return {
+            'do_sample': False,
+            'num_beams': self.num_beams,
+            'length_penalty': self.length_penalty,
+            'no_repeat_ngram_size': self.no_repeat_ngram_size,
+            'early_stopping': self.early_stopping,
+        }
+
+    @property
+    def cache_params(self):
+        """Everything about the preset that changes a summary, for cache keys"""
+        return dict(self.generate_kwargs, length_ratio=self.length_ratio)
+
+    def budget(self, input_tokens, max_length, min_length):
+        """
+        Summary length limits for one chunk, in proportion to its size
+
+        Args:
+            input_tokens (int): Tokens in the chunk
+            max_length (int): Largest summary length allowed
+            min_length (int): Smallest summary length asked for
+
+        Returns:
+            tuple: (max_length, min_length) for this chunk
+        """
+        if self.length_ratio is None:
+            return max_length, min_length
+        target = -(-int(input_tokens * self.length_ratio) // BUDGET_STEP) * BUDGET_STEP
+        chunk_max = min(max_length, max(target, MIN_SUMMARY_TOKENS))
+        return chunk_max, min(min_length, chunk_max // 2)
+
+
+# Greedy decoding ignores the length penalty and early stopping; they are set
+# to their neutral values so the model's beam search defaults do not apply
+PRESETS = {preset.name: preset for preset in (
+    # bart-large-cnn's generation config, which the scripts used before presets existed
+    GenerationPreset('original', num_beams=4, length_penalty=2.0, no_repeat_ngram_size=3,
+                     early_stopping=True, length_ratio=None),
+    GenerationPreset('fast', num_beams=1, length_penalty=1.0, no_repeat_ngram_size=3,
+                     early_stopping=False, length_ratio=0.15),
+    GenerationPreset('balanced', num_beams=2, length_penalty=1.0, no_repeat_ngram_size=3,
+                     early_stopping=True, length_ratio=0.2),
+    GenerationPreset('quality', num_beams=4, length_penalty=2.0, no_repeat_ngram_size=3,
+                     early_stopping=True, length_ratio=0.25),
+)}
+
+DEFAULT_PRESET = 'original'
+
+
+def get_preset(name=DEFAULT_PRESET):
+    """
+    Look up a generation preset
+
+    Args:
+        name (str): One of PRESETS
+
+    Returns:
+        GenerationPreset: The preset
+    """
+    if name not in PRESETS:
+        raise ValueError(f"Unknown generation preset: {name!r}")
+    return PRESETS[name]
+
+
+def _words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _f1(overlap, candidate_total, reference_total):
+    if not overlap:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate, reference, n=1):
+    """
+    ROUGE-N F1 between two texts
+
+    Args:
+        candidate (str): Summary being scored
+        reference (str): Reference summary
+        n (int): N-gram size
+
+    Returns:
+        float: F1 score between 0 and 1
+    """
+    candidate_words, reference_words = _words(candidate), _words(reference)
+    candidate_grams = collections.Counter(zip(*(candidate_words[i:] for i in range(n))))
+    reference_grams = collections.Counter(zip(*(reference_words[i:] for i in range(n))))
+    overlap = sum((candidate_grams & reference_grams).values())
+    return _f1(overlap, sum(candidate_grams.values()), sum(reference_grams.values()))
+
+
+def rouge_l(candidate, reference):
+    """
+    ROUGE-L F1 (longest common subsequence) between two texts
+
+    Args:
+        candidate (str): Summary being scored
+        reference (str): Reference summary
+
+    Returns:
+        float: F1 score between 0 and 1
+    """
+    candidate_words, reference_words = _words(candidate), _words(reference)
+    # One row of the LCS table at a time
+    previous = [0] * (len(reference_words) + 1)
+    for word in candidate_words:
+        current = [0]
+        for j, reference_word in enumerate(reference_words):
+            current.append(previous[j] + 1 if word == reference_word else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(candidate_words), len(reference_words))
+
+
+def _run_backend(name, texts, batch_size, preset):
+    """Summarize a corpus with one backend; runs in its own process"""
+    from SmartBlogAudioSummarizerCrawl import BlogEnhancer
+
+    started = time.perf_counter()
+    enhancer = BlogEnhancer(batch_size=batch_size, backend=get_backend(name), preset=get_preset(preset))
+    enhancer.summarizer
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    summaries = []
+    for text in texts:
+        started = time.perf_counter()
+        summaries.append(enhancer.create_summary(text))
+        latencies.append(time.perf_counter() - started)
+
+    peak_mb = None
+    try:
+        import resource
+        # ru_maxrss is in kB on Linux
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        pass
+    return {'load_seconds': load_seconds, 'latencies': latencies, 'summaries': summaries, 'peak_mb': peak_mb}
+
+
+def compare(texts, backends=('bart', 'distilbart', 'bart-int8', 'onnx'), batch_size=8, preset=DEFAULT_PRESET):
+    """
+    Compare backends on a corpus, scoring each against the first one
+
+    Args:
+        texts (list): Post contents
+        backends (tuple): Backend names; the first is the baseline
+        batch_size (int): Chunks per model call
+        preset (str): Generation preset used for every backend
+
+    Returns:
+        dict: Per backend: load time, mean and p95 latency per post, peak memory,
+            ROUGE-1/2/L F1 against the baseline (None if the baseline failed),
+            or the error that stopped it
+    """
+    results = {}
+    baseline = None
+    for name in backends:
+        # A fresh process per backend, so peak memory is not inherited from the previous one
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                run = executor.submit(_run_backend, name, texts, batch_size, preset).result()
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                continue
+
+        latencies = sorted(run['latencies'])
+        result = {
+            'load_s': round(run['load_seconds'], 2),
+            'mean_s': round(sum(latencies) / len(latencies), 3),
+            'p95_s': round(latencies[max(0, -(-len(latencies) * 95 // 100) - 1)], 3),
+            'peak_mb': round(run['peak_mb']) if run['peak_mb'] is not None else None,
+        }
+        # Only the first backend is the baseline; if it failed, nothing is scored
+        if name == backends[0]:
+            baseline = run['summaries']
+        pairs = list(zip(run['summaries'], baseline or []))
+        for metric, score in (('rouge1', lambda c, r: rouge_n(c, r, 1)),
+                              ('rouge2', lambda c, r: rouge_n(c, r, 2)),
+                              ('rougeL', rouge_l)):
+            result[metric] = round(sum(score(c, r) for c, r in pairs) / len(pairs), 3) if pairs else None
+        results[name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare summarizer backends on a local corpus')
+    parser.add_argument('corpus', help='Directory of .txt posts')
+    parser.add_argument('--backends', default='bart,distilbart,bart-int8,onnx',
+                        help='Comma-separated backends; the first is the ROUGE baseline')
+    parser.add_argument('--batch-size', type=int, default=8, help='Chunks per model call')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                        help='Generation preset used for every backend')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    args = parser.parse_args()
+    backends = args.backends.split(',')
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"unknown backend {name!r} (choose from {', '.join(BACKENDS)})")
+
+    texts = []
+    for path in sorted(glob.glob(os.path.join(args.corpus, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            texts.append(f.read())
+    if not texts:
+        parser.error(f"No .txt files found in {args.corpus}")
+
+    results = compare(texts, backends, args.batch_size, args.preset)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(texts)} posts, baseline {backends[0]}, preset {args.preset}")
+    if 'error' in results[backends[0]]:
+        print(f"Baseline {backends[0]} failed, so ROUGE is not reported")
+    print(f"{'backend':13s} {'load s':>7s} {'mean s':>7s} {'p95 s':>7s} {'peak MB':>8s} "
+          f"{'R-1':>6s} {'R-2':>6s} {'R-L':>6s}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:13s} failed: {result['error']}")
+            continue
+        rouge = ' '.join(f"{result[metric]:6.3f}" if result[metric] is not None else f"{'-':>6s}"
+                         for metric in ('rouge1', 'rouge2', 'rougeL'))
+        print(f"{name:13s} {result['load_s']:7.2f} {result['mean_s']:7.3f} {result['p95_s']:7.3f} "
+              f"{result['peak_mb'] or 0:8d} {rouge}")
+
+if __name__ == "__main__":
+    main()
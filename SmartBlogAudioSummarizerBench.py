@@ -0,0 +1,400 @@
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from SmartBlogAudioSummarizerBackends import BACKENDS, SummarizerBackend, get_backend
+from SmartBlogAudioSummarizerCrawl import BlogEnhancer
+from SmartBlogAudioSummarizerText import get_document
+
+"""
+Benchmark suite for every BlogEnhancer stage.
+
+Stages, each timed per post:
+
+fetch    extract_content_from_url against a local HTTP server (fetch + extract)
+chunk    _chunk_text on the extracted text
+summary  create_summary (chunking, batching and model calls)
+audio    create_audio on the summary (segmenting, synthesis and stitching)
+
+By default the run is deterministic and offline: the corpus is generated
+from a seed with posts from a few hundred to tens of thousands of words, the
+model is a tiny stand-in that returns the lead of each chunk, and TTS returns
+silent MP3 frames sized like real speech. So the numbers measure this
+project's own code. --real-model and --real-tts swap in the real model and
+gTTS.
+
+Each stage reports throughput, p50/p95 latency and peak RSS (reset between
+stages where Linux allows it). The sentence index that get_document keeps
+for reuse is cleared before every timed item, so each post is split into
+sentences inside the stage that is timing it, including on repeat passes. Save a run as a baseline and compare later
+runs against it; regressions beyond --threshold are listed and make the
+command exit with status 1:
+
+python SmartBlogAudioSummarizerBench.py --save bench-baseline.json
+python SmartBlogAudioSummarizerBench.py --baseline bench-baseline.json
+"""
+
+STAGES = ['fetch', 'chunk', 'summary', 'audio']
+
+# Post lengths in words for the generated corpus
+CORPUS_SIZES = (300, 1500, 6000, 20000)
+
+_WORDS = ("audio blog post reader summary model speech content cache batch token page feed "
+          "listen article crawl engine voice network latency memory thread process queue "
+          "chapter paragraph sentence write read learn build test measure improve").split()
+
+
+def make_corpus(sizes=CORPUS_SIZES, per_size=3, seed=0):
+    """
+    Generate blog pages of varied sizes, with the navigation, scripts and
+    footer noise real pages have
+
+    Args:
+        sizes (tuple): Post lengths in words
+        per_size (int): Pages generated per length
+        seed (int): Random seed, so every run sees the same corpus
+
+    Returns:
+        list: (name, html) tuples
+    """
+    rng = random.Random(seed)
+    pages = []
+    for size in sizes:
+        for index in range(per_size):
+            paragraphs = []
+            words_left = size
+            while words_left > 0:
+                sentences = []
+                for _ in range(rng.randint(2, 6)):
+                    length = min(words_left, rng.randint(6, 28))
+                    if length <= 0:
+                        break
+                    words_left -= length
+                    sentence = " ".join(rng.choice(_WORDS) for _ in range(length))
+                    sentences.append(sentence.capitalize() + rng.choice(".....?!"))
+                paragraphs.append(f"<p>{' '.join(sentences)}</p>")
+            html = (
+                "<html><head><title>Post</title><style>p { margin: 0 }</style>"
+                "<script>var tracking = 1;</script></head><body>"
+                "<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+                f"<article><h1>Post {size}-{index}</h1>{''.join(paragraphs)}</article>"
+                "<footer>Copyright. All rights reserved.</footer></body></html>"
+            )
+            pages.append((f"post-{size}-{index}.html", html))
+    return pages
+
+
+def load_corpus(directory):
+    """
+    Load saved pages
+
+    Args:
+        directory (str): Directory of .html pages
+
+    Returns:
+        list: (name, html) tuples
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.htm*'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with the interface BlogEnhancer uses"""
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def encode(self, text, add_special_tokens=True):
+        return self([text], add_special_tokens=add_special_tokens)['input_ids'][0]
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        extra = 2 if add_special_tokens else 0
+        return {'input_ids': [list(range(len(text.split()) + extra)) for text in texts]}
+
+
+class FakeSummarizer:
+    """Stand-in pipeline that returns the lead of each chunk"""
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.model = None
+
+    def __call__(self, texts, max_length=150, min_length=50, **kwargs):
+        return [{'summary_text': " ".join(text.split()[:max_length])} for text in texts]
+
+
+class FakeBackend(SummarizerBackend):
+    name = 'fake'
+
+    @property
+    def cache_name(self):
+        return 'fake'
+
+    def load(self):
+        return FakeSummarizer()
+
+
+# MPEG-2 Layer III, 48 kbit/s, 24 kHz, mono: 144-byte frames of 24 ms each
+_FAKE_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+# About 15 characters of speech per second
+_FRAMES_PER_CHAR = 1 / 15 / 0.024
+
+
+class FakeTtsEnhancer(BlogEnhancer):
+    def _synthesize(self, segment, lang):
+        """Return silent frames as long as the segment would take to speak"""
+        return _FAKE_FRAME * max(1, round(len(segment) * _FRAMES_PER_CHAR))
+
+
+def serve_corpus(pages):
+    """
+    Serve pages from memory on a local port
+
+    Args:
+        pages (list): (name, html) tuples
+
+    Returns:
+        tuple: (server, list of page URLs)
+    """
+    bodies = {f"/{name}": html.encode('utf-8') for name, html in pages}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, [f"{base_url}/{name}" for name, _ in pages]
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter for this process (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process in MB, since the last reset where supported"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        # Lifetime peak; ru_maxrss is in kB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        return None
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of sorted latencies in seconds, returned in milliseconds"""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return round(sorted_values[int(index)] * 1000, 3)
+
+
+def time_stage(items, func, repeat=3):
+    """
+    Time a stage over every item, with the shared sentence index cleared before each one
+
+    Args:
+        items (list): (input, size in bytes) tuples
+        func (callable): The stage, called once per input
+        repeat (int): Passes over the items
+
+    Returns:
+        tuple: (stats dict, outputs of the last pass)
+    """
+    _reset_peak_rss()
+    latencies = []
+    outputs = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        outputs = []
+        for value, _ in items:
+            # Every item pays for sentence splitting, as it would the first time a post is seen
+            get_document.cache_clear()
+            item_started = time.perf_counter()
+            outputs.append(func(value))
+            latencies.append(time.perf_counter() - item_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total_bytes = sum(size for _, size in items) * repeat
+    return {
+        'items_per_s': round(len(latencies) / elapsed, 2),
+        'mb_per_s': round(total_bytes / elapsed / 1024 / 1024, 3),
+        'p50_ms': _percentile(latencies, 50),
+        'p95_ms': _percentile(latencies, 95),
+        'peak_rss_mb': _peak_rss_mb(),
+    }, outputs
+
+
+def run(pages, stages=STAGES, repeat=3, real_model=None, real_tts=False):
+    """
+    Benchmark the BlogEnhancer stages on a corpus
+
+    Args:
+        pages (list): (name, html) tuples
+        stages (list): Stages to run, from STAGES
+        repeat (int): Passes over the corpus per stage
+        real_model (str): Summarizer backend to use instead of the stand-in model
+        real_tts (bool): Use gTTS instead of the fake TTS backend
+
+    Returns:
+        dict: Stats per stage, plus the run settings
+    """
+    backend = get_backend(real_model) if real_model else FakeBackend()
+    enhancer_class = BlogEnhancer if real_tts else FakeTtsEnhancer
+    enhancer = enhancer_class(backend=backend)
+
+    started = time.perf_counter()
+    enhancer.summarizer
+    results = {'settings': {'pages': len(pages), 'repeat': repeat, 'model': backend.name,
+                            'tts': 'gtts' if real_tts else 'fake',
+                            'load_s': round(time.perf_counter() - started, 3)}}
+
+    server, urls = serve_corpus(pages)
+    try:
+        sizes = [len(html.encode('utf-8')) for _, html in pages]
+        results['fetch'], texts = time_stage(list(zip(urls, sizes)), enhancer.extract_content_from_url,
+                                             repeat if 'fetch' in stages else 1)
+        if 'fetch' not in stages:
+            del results['fetch']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    text_items = [(text, len(text.encode('utf-8'))) for text in texts]
+    if 'chunk' in stages:
+        results['chunk'], _ = time_stage(text_items, enhancer._chunk_text, repeat)
+    summaries = None
+    if 'summary' in stages:
+        results['summary'], summaries = time_stage(text_items, enhancer.create_summary, repeat)
+    if 'audio' in stages:
+        summaries = summaries or [enhancer.create_summary(text) for text in texts]
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'bench.mp3')
+            results['audio'], _ = time_stage([(summary, len(summary.encode('utf-8'))) for summary in summaries],
+                                             lambda summary: enhancer.create_audio(summary, output_path), repeat)
+    return results
+
+
+def find_regressions(results, baseline, threshold=0.1, min_ms=0.5):
+    """
+    Compare a run with a baseline run
+
+    Args:
+        results (dict): Output of run()
+        baseline (dict): Output of an earlier run()
+        threshold (float): Relative change treated as a regression
+        min_ms (float): Latency changes smaller than this are ignored as noise
+
+    Returns:
+        list: Description of each regression
+    """
+    regressions = []
+    for stage in STAGES:
+        if stage not in results or stage not in baseline:
+            continue
+        now, before = results[stage], baseline[stage]
+        for metric in ('p50_ms', 'p95_ms'):
+            if now[metric] > before[metric] * (1 + threshold) and now[metric] - before[metric] > min_ms:
+                regressions.append(f"{stage} {metric}: {before[metric]} -> {now[metric]}")
+        if now['items_per_s'] < before['items_per_s'] * (1 - threshold):
+            regressions.append(f"{stage} items_per_s: {before['items_per_s']} -> {now['items_per_s']}")
+        if (now['peak_rss_mb'] and before['peak_rss_mb']
+                and now['peak_rss_mb'] > before['peak_rss_mb'] * (1 + threshold)):
+            regressions.append(f"{stage} peak_rss_mb: {before['peak_rss_mb']} -> {now['peak_rss_mb']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every BlogEnhancer stage')
+    parser.add_argument('--corpus', help='Directory of saved .html pages (default: generated corpus)')
+    parser.add_argument('--per-size', type=int, default=3, help='Generated pages per post length')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated corpus')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated stages to run ({', '.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus per stage')
+    parser.add_argument('--real-model', choices=list(BACKENDS),
+                        help='Use this summarizer backend instead of the stand-in model')
+    parser.add_argument('--real-tts', action='store_true', help='Use gTTS instead of the fake TTS backend')
+    parser.add_argument('--save', help='Write the results to this JSON file (e.g. as a baseline)')
+    parser.add_argument('--baseline', help='Compare against results saved with --save')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown or memory growth reported as a regression')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    args = parser.parse_args()
+    stages = args.stages.split(',')
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage {stage!r} (choose from {', '.join(STAGES)})")
+
+    pages = load_corpus(args.corpus) if args.corpus else make_corpus(per_size=args.per_size, seed=args.seed)
+    if not pages:
+        parser.error(f"No .html files found in {args.corpus}")
+
+    results = run(pages, stages, args.repeat, args.real_model, args.real_tts)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        settings = results['settings']
+        print(f"{settings['pages']} pages x {settings['repeat']}, model {settings['model']} "
+              f"(loaded in {settings['load_s']} s), tts {settings['tts']}")
+        print(f"{'stage':8s} {'items/s':>9s} {'MB/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'peak MB':>8s}")
+        for stage in STAGES:
+            if stage in results:
+                result = results[stage]
+                print(f"{stage:8s} {result['items_per_s']:9.2f} {result['mb_per_s']:8.3f} "
+                      f"{result['p50_ms']:9.3f} {result['p95_ms']:9.3f} {result['peak_rss_mb'] or 0:8.1f}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['settings'].get('model') != results['settings']['model']:
+            print(f"Warning: baseline used model {baseline['settings'].get('model')}")
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
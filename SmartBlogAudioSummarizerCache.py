@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+"""
+On-disk caches shared by the Smart Blog Audio Summarizer scripts.
+
+SummaryCache stores chunk summaries keyed on a hash of everything that
+affects the model output (chunk text, model name, length limits and
+generation parameters), so re-processing an unchanged or lightly edited
+post only runs the model on the chunks that actually changed.
+
+AudioCache stores synthesized MP3 segments keyed on the segment text and
+the voice settings, so only edited segments are sent to the TTS service.
+
+HttpCache remembers each page's ETag/Last-Modified validators and its
+extracted text, so re-crawls can send conditional requests and skip
+downloading and parsing when the server answers 304 Not Modified. Entries
+record the extraction settings the text was made with; with any other
+settings they are ignored, so the page is downloaded and extracted again.
+
+By default the caches live in ~/.cache/smart-blog-audio-summarizer; the
+summary and audio caches are size-capped and evict the least recently
+used entries first.
+"""
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "smart-blog-audio-summarizer")
+
+
+def make_key(*parts, **params):
+    """
+    Build a stable cache key from text parts and keyword parameters
+
+    Args:
+        *parts: Values that identify the cached item (text, model name, ...)
+        **params: Extra parameters that change the cached result
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps([parts, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=64 * 1024 * 1024):
+        """
+        Open (or create) the summary cache
+
+        Args:
+            cache_dir (str): Directory holding the cache database
+            max_bytes (int): Size cap for stored summaries before LRU eviction
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'summaries.sqlite3')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._db.commit()
+
+    def make_key(self, chunk, model_name, max_length, min_length, **generate_kwargs):
+        """
+        Build the cache key for one chunk summary
+
+        Args:
+            chunk (str): Chunk text sent to the model
+            model_name (str): Name of the summarization model
+            max_length (int): Maximum summary length
+            min_length (int): Minimum summary length
+            **generate_kwargs: Any other generation parameters
+
+        Returns:
+            str: Cache key
+        """
+        return make_key(chunk, model_name, max_length, min_length, **generate_kwargs)
+
+    def get_many(self, keys):
+        """
+        Look up several summaries at once and mark them as recently used
+
+        Args:
+            keys (list): Cache keys
+
+        Returns:
+            dict: Cached summary for every key that was found
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", batch)
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE summaries SET last_used = ? WHERE key = ?",
+                                     [(now, key) for key in found])
+                self._db.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items):
+        """
+        Store several summaries and evict old entries if over the size cap
+
+        Args:
+            items (dict): Summary text by cache key
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, summary, len(summary.encode('utf-8')), now) for key, summary in items.items()])
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Delete the least recently used entries until the cache fits max_bytes"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM summaries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM summaries WHERE key = ?", stale)
+
+    def stats(self):
+        """
+        Report cache usage
+
+        Returns:
+            dict: Hit/miss counters plus the number and total size of entries
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._db.close()
+
+
+class AudioCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        """
+        Open (or create) the audio segment cache
+
+        Args:
+            cache_dir (str): Directory holding the cache; segments go in its audio/ subdirectory
+            max_bytes (int): Size cap for stored audio before LRU eviction
+        """
+        self.directory = os.path.join(cache_dir, 'audio')
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                         if entry.name.endswith('.mp3'))
+
+    def make_key(self, segment, **voice_params):
+        """
+        Build the cache key for one audio segment
+
+        Args:
+            segment (str): Segment text
+            **voice_params: Engine, voice, rate, volume, language, ...
+
+        Returns:
+            str: Cache key
+        """
+        return make_key(segment, **voice_params)
+
+    def get(self, key):
+        """
+        Read a cached segment and mark it as recently used
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bytes: MP3 data, or None if the segment is not cached
+        """
+        path = os.path.join(self.directory, key + '.mp3')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The file's modification time doubles as its last-used time
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Store a segment and evict old entries if over the size cap
+
+        Args:
+            key (str): Cache key
+            data (bytes): MP3 data
+        """
+        path = os.path.join(self.directory, key + '.mp3')
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            # Overwriting a key replaces its file, so only the difference is added
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+            self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete the least recently used segments until the cache fits max_bytes"""
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.mp3')),
+                         key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+
+    def stats(self):
+        """
+        Report cache usage
+
+        Returns:
+            dict: Hit/miss counters plus the total size of stored segments
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self._size}
+
+
+class HttpCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Open (or create) the HTTP validator cache
+
+        Args:
+            cache_dir (str): Directory holding the cache database
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'http.sqlite3')
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                settings TEXT
+            )
+        """)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(pages)")]
+        if 'settings' not in columns:
+            # Older entries have no settings recorded, so they never match and are refetched
+            self._db.execute("ALTER TABLE pages ADD COLUMN settings TEXT")
+        self._db.commit()
+
+    def get(self, url, settings=None):
+        """
+        Look up the cached validators and extracted text for a URL
+
+        Args:
+            url (str): Page URL
+            settings (str): Fingerprint of the extraction settings the text must have been made with
+
+        Returns:
+            dict: etag, last_modified and content, or None if the URL is not cached with these settings
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, content, settings FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or row[3] != settings:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content': row[2]}
+
+    def conditional_headers(self, cached):
+        """
+        Build If-None-Match / If-Modified-Since headers from a cached entry
+
+        Args:
+            cached (dict): Entry returned by get(), or None
+
+        Returns:
+            dict: Request headers (empty if there is nothing to validate against)
+        """
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def put(self, url, etag, last_modified, content, settings=None):
+        """
+        Store a page's validators and extracted text
+
+        Args:
+            url (str): Page URL
+            etag (str): ETag response header, if any
+            last_modified (str): Last-Modified response header, if any
+            content (str): Extracted text
+            settings (str): Fingerprint of the extraction settings the text was made with
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, content, fetched_at, settings) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content, time.time(), settings))
+            self._db.commit()
@@ -1,11 +1,27 @@
-from transformers import pipeline
-from gtts import gTTS
-import nltk
-from nltk.tokenize import sent_tokenize
+import io
 import os
-import requests
-from bs4 import BeautifulSoup
+import re
+import sys
+import shutil
+import hashlib
+import itertools
+import contextlib
+import threading
 import argparse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from SmartBlogAudioSummarizerAudio import iter_segments, segment_text, stream_mp3
+from SmartBlogAudioSummarizerBackends import BACKENDS, DEFAULT_PRESET, PRESETS, get_backend, get_preset
+from SmartBlogAudioSummarizerCache import DEFAULT_CACHE_DIR, AudioCache, HttpCache, SummaryCache, make_key
+from SmartBlogAudioSummarizerDedup import (DEFAULT_MIN_PAGES, DEFAULT_THRESHOLD, BoilerplateFilter,
+                                           NearDuplicateIndex, minhash)
+from SmartBlogAudioSummarizerExtract import DEFAULT_SELECTORS, get_extractor
+from SmartBlogAudioSummarizerManifest import MANIFEST_NAME, STAGES, Manifest, atomic_write, stage_keys
+from SmartBlogAudioSummarizerMetrics import Metrics, profiled
+from SmartBlogAudioSummarizerText import content_key, get_document
+from SmartBlogAudioSummarizerTranscode import PROFILES, Transcoder, format_renditions, get_profiles
+from SmartBlogAudioSummarizerWorkers import SummaryWorkerPool, format_memory, set_torch_threads
 
 """
 Install the required packages:
@@ -21,6 +37,21 @@ python blog_enhancer.py https://yourblog.com/your-post-url --output-dir my_audio
 # Specify different language (e.g., Spanish)
 python blog_enhancer.py https://yourblog.com/your-post-url --lang es
 
+# Process many posts concurrently from a list file, a sitemap or an RSS/Atom feed
+python blog_enhancer.py --url-file urls.txt
+python blog_enhancer.py --sitemap https://yourblog.com/sitemap.xml --fetch-workers 16 --per-host 4
+python blog_enhancer.py --feed https://yourblog.com/feed.xml
+
+In batch mode each post is written to its own subdirectory of the output directory.
+A manifest in the output directory records what each run finished, so the
+next run skips posts whose text has not changed and resumes interrupted
+ones from the first unfinished stage (--force redoes everything).
+
+Text blocks repeated across pages of the same site (share buttons, related
+posts, footers) are dropped before summarizing, and a post that is a near
+copy of one already processed reuses its summary and audio:
+python blog_enhancer.py --sitemap https://yourblog.com/sitemap.xml --boilerplate-min-pages 5
+python blog_enhancer.py --feed https://yourblog.com/feed.xml --keep-boilerplate --no-dedupe
 
 The script will:
 
@@ -29,15 +60,102 @@ Generate a summary
 Create audio files for both the full content and summary
 Save everything in the specified output directory (defaults to 'output')
 
-Note: You might need to adjust the possible_content_selectors in the extract_content_from_url method based on your website's HTML structure.
+Note: You might need to adjust the content selectors (--selectors) based on your website's HTML structure.
 
 """
+# Safety cap on summarize-the-summaries passes when reducing
+MAX_REDUCE_LEVELS = 6
+
 class BlogEnhancer:
-    def __init__(self):
-        # Initialize the summarization pipeline
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        # Download required NLTK data
-        nltk.download('punkt')
+    def __init__(self, batch_size=8, max_chunk_tokens=1024, chunk_overlap=0, summary_cache=None,
+                 audio_cache=None, http_cache=None, timeout=30, retries=3, pool_size=10,
+                 extractor=None, tts_concurrency=4, tts_retries=2, worker_pool=None,
+                 backend=None, metrics=None, boilerplate=None, near_duplicates=None, preset=None):
+        # Number of chunks sent to the model per generate call
+        self.batch_size = batch_size
+        # Token budget per chunk (BART's context window) and sentences shared between chunks
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        # Optional SummaryCache consulted per chunk before running the model
+        self.summary_cache = summary_cache
+        # Optional AudioCache consulted per text segment before calling the TTS service
+        self.audio_cache = audio_cache
+        # Segments synthesized at once, and retries per failed segment
+        self.tts_concurrency = tts_concurrency
+        self.tts_retries = tts_retries
+        # Optional SummaryWorkerPool that runs the model calls in other processes
+        self.worker_pool = worker_pool
+        # Per-stage spans; disabled unless a Metrics with an output path is passed
+        self.metrics = metrics or Metrics()
+        # The summarization pipeline is created lazily by the summarizer property
+        self.backend = backend or get_backend('bart')
+        self.model_name = self.backend.cache_name
+        self._summarizer = None
+        # Beam search settings and per-chunk summary budgets, see GenerationPreset
+        self.preset = preset or get_preset()
+        # Optional HttpCache used for conditional requests
+        self.http_cache = http_cache
+        # HTML content extractor; see SmartBlogAudioSummarizerExtract for the backends
+        self.extractor = extractor or get_extractor()
+        # Optional BoilerplateFilter that drops blocks repeated across a site's pages
+        self.boilerplate = boilerplate
+        # Optional NearDuplicateIndex of processed posts whose outputs can be reused
+        self.near_duplicates = near_duplicates
+        # HTTP settings for the shared, connection-pooling session
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    @property
+    def summarizer(self):
+        """
+        The summarization pipeline, loaded on first use
+        
+        Loading BART takes several seconds and over a gigabyte of memory, so it
+        is deferred until something actually needs to be summarized.
+        """
+        if self._summarizer is None:
+            self._summarizer = self.backend.load()
+        return self._summarizer
+    
+    @property
+    def session(self):
+        """
+        Shared HTTP session, created on first use
+        
+        Keeps connections alive between requests and retries connection errors
+        and 429/5xx responses with exponential backoff.
+        """
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                retry = Retry(total=self.retries, backoff_factor=0.5,
+                              status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=('GET', 'HEAD'))
+                adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                      pool_maxsize=self.pool_size,
+                                      max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+    
+    @property
+    def extraction_settings(self):
+        """
+        Fingerprint of everything that changes a page's extracted text, for the HTTP cache
+        
+        Returns:
+            str: Key over the extractor backend, selectors, size limit and boilerplate filtering
+        """
+        return make_key(self.extractor.name, self.extractor.selectors, max_bytes=self.extractor.max_bytes,
+                        boilerplate_min_pages=self.boilerplate.min_pages if self.boilerplate is not None else None)
     
     def extract_content_from_url(self, url):
         """
@@ -49,53 +167,66 @@ class BlogEnhancer:
         Returns:
             str: The extracted content
         """
+        return self.fetch_content(url)[0]
+    
+    def fetch_content(self, url):
+        """
+        Extract the main content from a blog post URL, revalidating cached copies
+        
+        When an HTTP cache is configured, the request carries the ETag and
+        Last-Modified validators from the previous fetch; a 304 Not Modified
+        answer returns the previously extracted text without re-parsing.
+        
+        Args:
+            url (str): The URL of the blog post
+            
+        Returns:
+            tuple: (extracted content, whether the page changed since the cached fetch)
+        """
         try:
+            settings = self.extraction_settings
+            cached = self.http_cache.get(url, settings) if self.http_cache is not None else None
+            headers = self.http_cache.conditional_headers(cached) if cached else {}
+            
             # Send request to the URL
-            response = requests.get(url)
+            with self.metrics.span('fetch', url=url) as span:
+                response = self.session.get(url, timeout=self.timeout, headers=headers)
+                span['status'] = response.status_code
+                span['bytes'] = len(response.content)
+            if cached and response.status_code == 304:
+                content = cached['content']
+                if self.boilerplate is not None:
+                    content = self.boilerplate.filter_text(url, content)
+                return content, False
             response.raise_for_status()
             
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            # Try to find the main content
-            # This might need adjustment based on your website's structure
-            content = ""
-            
-            # Common content selectors - adjust these based on your website
-            possible_content_selectors = [
-                'article',
-                '.post-content',
-                '.entry-content',
-                '.content',
-                'main',
-                '#content'
-            ]
-            
-            for selector in possible_content_selectors:
-                content_element = soup.select_one(selector)
-                if content_element:
-                    content = content_element.get_text()
-                    break
-            
-            if not content:
-                # Fallback to body if no specific content container found
-                content = soup.body.get_text()
-            
-            # Clean up the text
-            lines = (line.strip() for line in content.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            content = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return content
+            with self.metrics.span('parse', url=url, bytes=len(response.content)) as span:
+                content = self._extract_text(response.text, url)
+                span['chars'] = len(content)
+            if self.http_cache is not None:
+                self.http_cache.put(url, response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified'), content, settings)
+            return content, True
             
         except Exception as e:
             raise Exception(f"Error extracting content from URL: {str(e)}")
+    
+    def _extract_text(self, html, url=None):
+        """
+        Extract the main content from a blog post's HTML
+        
+        Args:
+            html (str): The page's HTML
+            url (str): The page's URL, which lets the boilerplate filter compare it with its site
+            
+        Returns:
+            str: The extracted content
+        """
+        if self.boilerplate is not None and url is not None:
+            return self.boilerplate.clean(url, self.extractor.extract_blocks(html))
+        return self.extractor.extract(html)
 
-    def create_summary(self, text, max_length=150, min_length=50):
+    def create_summary(self, text, max_length=150, min_length=50, reduce=False, target_length=None):
         """
         Create a summary of the blog post text
         
@@ -103,24 +234,180 @@ class BlogEnhancer:
             text (str): The blog post content
             max_length (int): Maximum length of summary in words
             min_length (int): Minimum length of summary in words
+            reduce (bool): Summarize the chunk summaries until they fit target_length
+            target_length (int): Maximum summary length in tokens when reducing
+                (default: max_length)
             
         Returns:
             str: Summarized text
         """
+        return self.create_summaries([text], max_length, min_length, reduce, target_length)[0]
+    
+    @profiled
+    def create_summaries(self, texts, max_length=150, min_length=50, reduce=False, target_length=None):
+        """
+        Create summaries for several blog posts, batching chunks across posts
+        
+        Args:
+            texts (list): Blog post contents
+            max_length (int): Maximum length of each summary in words
+            min_length (int): Minimum length of each summary in words
+            reduce (bool): Summarize the chunk summaries until they fit target_length
+            target_length (int): Maximum summary length in tokens when reducing
+                (default: max_length)
+            
+        Returns:
+            list: Summarized text for each post, in input order
+        """
         # Ensure text isn't too long for the model
-        chunks = self._chunk_text(text)
+        with self.metrics.span('chunk', posts=len(texts), chars=sum(len(text) for text in texts)) as span:
+            chunked = [self._chunk_text(text) for text in texts]
+            span['chunks'] = sum(len(chunks) for chunks in chunked)
+        summaries = self._summarize_posts(chunked, max_length, min_length)
+        if not reduce:
+            return summaries
+        
+        if target_length is None:
+            target_length = max_length
+        
+        # Re-chunk and summarize the joined summaries, one batched pass per level
+        for _ in range(MAX_REDUCE_LEVELS):
+            pending = [i for i, summary in enumerate(summaries)
+                       if self._count_tokens(summary) > target_length]
+            if not pending:
+                break
+            
+            rechunked = {i: self._chunk_text(summaries[i]) for i in pending}
+            # Posts down to a single chunk are summarized straight to the target length
+            final = [i for i in pending if len(rechunked[i]) == 1]
+            intermediate = [i for i in pending if len(rechunked[i]) > 1]
+            
+            for posts, level_max, level_min in (
+                    (final, target_length, min(min_length, target_length // 2)),
+                    (intermediate, max_length, min_length)):
+                reduced = self._summarize_posts([rechunked[i] for i in posts], level_max, level_min)
+                for i, summary in zip(posts, reduced):
+                    summaries[i] = summary
+        
+        return summaries
+    
+    def _summarize_posts(self, chunked, max_length, min_length):
+        """
+        Summarize the chunks of several posts in one batched pass
+        
+        Args:
+            chunked (list): List of chunk lists, one per post
+            max_length (int): Maximum length of each chunk summary
+            min_length (int): Minimum length of each chunk summary
+            
+        Returns:
+            list: Joined chunk summaries for each post
+        """
+        flat_chunks = [chunk for chunks in chunked for chunk in chunks]
+        flat_summaries = self._summarize_chunks(flat_chunks, max_length, min_length)
+        
         summaries = []
+        position = 0
+        for chunks in chunked:
+            summaries.append(" ".join(flat_summaries[position:position + len(chunks)]))
+            position += len(chunks)
+        
+        return summaries
+    
+    def _summarize_chunks(self, chunks, max_length, min_length):
+        """
+        Summarize chunks in batches of similar token length
+        
+        Args:
+            chunks (list): Text chunks that fit the model's input window
+            max_length (int): Maximum length of each chunk summary
+            min_length (int): Minimum length of each chunk summary
+            
+        Returns:
+            list: Summary of each chunk, in input order
+        """
+        if not chunks:
+            return []
         
-        for chunk in chunks:
-            summary = self.summarizer(chunk, 
-                                    max_length=max_length, 
-                                    min_length=min_length, 
-                                    do_sample=False)[0]['summary_text']
-            summaries.append(summary)
+        generate_kwargs = self.preset.generate_kwargs
+        summaries = [None] * len(chunks)
         
-        return " ".join(summaries)
+        # Reuse cached summaries and only run the model on the remaining chunks
+        keys = None
+        if self.summary_cache is not None:
+            keys = [self.summary_cache.make_key(content_key(chunk), self.model_name, max_length, min_length,
+                                                **self.preset.cache_params)
+                    for chunk in chunks]
+            with self.metrics.span('summary_cache', lookups=len(keys)) as span:
+                cached = self.summary_cache.get_many(keys)
+                span['hits'] = len(cached)
+            for i, key in enumerate(keys):
+                summaries[i] = cached.get(key)
+        todo = [i for i in range(len(chunks)) if summaries[i] is None]
+        if not todo:
+            return summaries
+        
+        if self.worker_pool is not None:
+            # Shard the model calls across worker processes, balanced by token count
+            with self.metrics.span('generate', chunks=len(todo), workers=self.worker_pool.workers):
+                results = self.worker_pool.summarize([chunks[i] for i in todo], max_length, min_length)
+            for i, summary in zip(todo, results):
+                summaries[i] = summary
+            if keys is not None:
+                self.summary_cache.put_many({keys[i]: summaries[i] for i in todo})
+            return summaries
+        
+        # Each chunk's summary budget follows its token count
+        lengths = [len(ids) for ids in self.summarizer.tokenizer([chunks[i] for i in todo])['input_ids']]
+        token_counts = dict(zip(todo, lengths))
+        budgets = {i: self.preset.budget(token_counts[i], max_length, min_length) for i in todo}
+        # A chunk already no longer than its summary could be is kept as it is
+        short = [i for i in todo if self.preset.length_ratio is not None and token_counts[i] <= budgets[i][0]]
+        for i in short:
+            summaries[i] = ' '.join(chunks[i].split())
+        if keys is not None and short:
+            self.summary_cache.put_many({keys[i]: summaries[i] for i in short})
+        
+        # Batch chunks with the same budget, sorted by token length so each batch pads to roughly the same size
+        order = sorted((i for i in todo if summaries[i] is None), key=lambda i: (budgets[i], token_counts[i]))
+        batches = []
+        for budget, group in itertools.groupby(order, key=budgets.get):
+            group = list(group)
+            batches.extend((budget, group[start:start + self.batch_size])
+                           for start in range(0, len(group), self.batch_size))
+        
+        for (batch_max, batch_min), batch in batches:
+            with self.metrics.span('generate', chunks=len(batch), max_length=batch_max,
+                                   tokens_in=sum(token_counts[i] for i in batch)) as span:
+                outputs = self.summarizer([chunks[i] for i in batch],
+                                          max_length=batch_max,
+                                          min_length=batch_min,
+                                          truncation=True,
+                                          batch_size=len(batch),
+                                          **generate_kwargs)
+                if self.metrics.enabled:
+                    span['tokens_out'] = sum(len(ids) for ids in self.summarizer.tokenizer(
+                        [output['summary_text'] for output in outputs], add_special_tokens=False)['input_ids'])
+            for i, output in zip(batch, outputs):
+                summaries[i] = output['summary_text']
+            if keys is not None:
+                self.summary_cache.put_many({keys[i]: summaries[i] for i in batch})
+        
+        return summaries
+
+    def _count_tokens(self, text):
+        """
+        Count the summarizer tokens in a piece of text
+        
+        Args:
+            text (str): Text to measure
+            
+        Returns:
+            int: Number of tokens, excluding special tokens
+        """
+        return len(self.summarizer.tokenizer.encode(text, add_special_tokens=False))
     
-    def create_audio(self, text, output_path, lang='en'):
+    def create_audio(self, text, output_path, lang='en', sink=None):
         """
         Convert text to speech and save as MP3
         
@@ -128,87 +415,817 @@ class BlogEnhancer:
             text (str): Text to convert to speech
             output_path (str): Path to save the audio file
             lang (str): Language code (default: 'en' for English)
+            sink (file): Binary file-like object to also stream the audio to as it is made
             
         Returns:
             str: Path to the generated audio file
         """
-        tts = gTTS(text=text, lang=lang, slow=False)
-        tts.save(output_path)
+        with self.metrics.span('audio', path=output_path, chars=len(text)) as span:
+            span['bytes'] = sum(len(frames) for frames in self.stream_audio(text, output_path, lang, sink))
         return output_path
     
-    def _chunk_text(self, text, max_chars=1000):
+    def stream_audio(self, text, output_path=None, lang='en', sink=None):
         """
-        Split text into smaller chunks for processing
+        Convert text to speech, yielding MP3 audio as soon as each segment is ready
+        
+        Args:
+            text (str): Text to convert to speech
+            output_path (str): Path to also save the audio file to, or None
+            lang (str): Language code (default: 'en' for English)
+            sink (file): Binary file-like object to copy the audio to (e.g. stdout)
+            
+        Yields:
+            bytes: MP3 frames for each segment, in playback order
+        """
+        segments = segment_text(text)
+        if not segments:
+            raise ValueError("No text to convert to speech")
+        
+        # Synthesize per segment, several at a time, so an edited post only
+        # re-synthesizes the changed parts and long posts finish sooner
+        parts = iter_segments(segments, lambda segment: self._segment_audio(segment, lang),
+                              self.tts_concurrency, self.tts_retries)
+        yield from stream_mp3(parts, output_path, sink)
+    
+    def _segment_audio(self, segment, lang):
+        """
+        Synthesize one text segment, reusing cached audio when available
+        
+        Args:
+            segment (str): Text segment
+            lang (str): Language code
+            
+        Returns:
+            bytes: MP3 data for the segment
+        """
+        with self.metrics.span('tts', chars=len(segment)) as span:
+            key = None
+            data = None
+            if self.audio_cache is not None:
+                key = self.audio_cache.make_key(content_key(segment), engine='gtts', lang=lang, slow=False)
+                data = self.audio_cache.get(key)
+            span['cached'] = data is not None
+            
+            if data is None:
+                data = self._synthesize(segment, lang)
+                if key is not None:
+                    self.audio_cache.put(key, data)
+            span['bytes'] = len(data)
+        return data
+    
+    def _synthesize(self, segment, lang):
+        """
+        Call the TTS service for one text segment
+        
+        Args:
+            segment (str): Text segment
+            lang (str): Language code
+            
+        Returns:
+            bytes: MP3 data for the segment
+        """
+        from gtts import gTTS
+        
+        buffer = io.BytesIO()
+        gTTS(text=segment, lang=lang, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _chunk_text(self, text, max_tokens=None, overlap=None):
+        """
+        Split text into sentence-aligned chunks that fill the model's token budget
         
         Args:
             text (str): Text to split
-            max_chars (int): Maximum characters per chunk
+            max_tokens (int): Maximum tokens per chunk, including special tokens
+                (default: self.max_chunk_tokens)
+            overlap (int): Number of trailing sentences repeated at the start of
+                the next chunk (default: self.chunk_overlap)
             
         Returns:
             list: List of text chunks
         """
-        sentences = sent_tokenize(text)
+        tokenizer = self.summarizer.tokenizer
+        if max_tokens is None:
+            max_tokens = self.max_chunk_tokens
+        if overlap is None:
+            overlap = self.chunk_overlap
+        # Leave room for the special tokens the model adds around every input
+        budget = max_tokens - tokenizer.num_special_tokens_to_add()
+        
+        # Sentences come from the shared index, so a post is only run through Punkt once
+        document = get_document(text)
+        if not len(document):
+            return []
+        
+        # Count each sentence with the leading space it gets once joined
+        lengths = [len(ids) for ids in tokenizer([" " + sentence for sentence in document],
+                                                 add_special_tokens=False)['input_ids']]
+        # Units are (start, end, tokens, sentence index); pieces of split sentences have no index
+        units = []
+        for index, length in enumerate(lengths):
+            if length <= budget:
+                units.append((document.starts[index], document.ends[index], length, index))
+            else:
+                units.extend(self._split_sentence(document, index, budget))
+        
         chunks = []
         current_chunk = []
         current_length = 0
         
-        for sentence in sentences:
-            if current_length + len(sentence) <= max_chars:
-                current_chunk.append(sentence)
-                current_length += len(sentence)
-            else:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-                current_length = len(sentence)
+        for position, unit in enumerate(units):
+            length = unit[2]
+            if current_chunk and current_length + length > budget:
+                chunks.append(self._passage(document, [units[i] for i in current_chunk]))
+                # Repeat the last few sentences for context, as long as they leave room
+                current_chunk = current_chunk[-overlap:] if overlap > 0 else []
+                current_length = sum(units[i][2] for i in current_chunk)
+                while current_chunk and current_length + length > budget:
+                    current_length -= units[current_chunk.pop(0)][2]
+            current_chunk.append(position)
+            current_length += length
         
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            chunks.append(self._passage(document, [units[i] for i in current_chunk]))
             
         return chunks
 
+    def _split_sentence(self, document, index, budget):
+        """
+        Split a sentence that does not fit the token budget on word boundaries
+        
+        Args:
+            document (Document): The text's sentence index
+            index (int): Index of the sentence
+            budget (int): Maximum tokens per piece
+            
+        Returns:
+            list: (start, end, tokens, None) pieces that fit the budget
+        """
+        start, end = document.starts[index], document.ends[index]
+        words = [match.span() for match in re.finditer(r'\S+', document.text[start:end])]
+        lengths = [len(ids) for ids in self.summarizer.tokenizer(
+            [" " + document.text[start + word_start:start + word_end] for word_start, word_end in words],
+            add_special_tokens=False)['input_ids']]
+        pieces = []
+        piece_start = None
+        current_length = 0
+        
+        # A single word longer than the budget is left whole; the pipeline truncates it
+        for (word_start, word_end), length in zip(words, lengths):
+            if piece_start is not None and current_length + length > budget:
+                pieces.append((piece_start, piece_end, current_length, None))
+                piece_start = None
+                current_length = 0
+            if piece_start is None:
+                piece_start = start + word_start
+            piece_end = start + word_end
+            current_length += length
+        
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, current_length, None))
+        
+        return pieces
+    
+    def _passage(self, document, units):
+        """
+        Join consecutive units into one slice of the document's text
+        
+        Args:
+            document (Document): The text's sentence index
+            units (list): (start, end, tokens, sentence index) tuples
+            
+        Returns:
+            str: A Passage keyed by its sentences, or a plain slice if it holds part of one
+        """
+        if all(unit[3] is not None for unit in units):
+            return document.passage(units[0][3], units[-1][3] + 1)
+        return document.text[units[0][0]:units[-1][1]]
+
+def read_url_list(path):
+    """
+    Read post URLs from a text file, one per line
+    
+    Args:
+        path (str): File with one URL per line; blank lines and # comments are ignored
+        
+    Returns:
+        list: List of URLs
+    """
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def parse_sitemap(xml_text):
+    """
+    Parse a sitemap or sitemap index
+    
+    Args:
+        xml_text (str): Sitemap XML
+        
+    Returns:
+        tuple: (page URLs, nested sitemap URLs)
+    """
+    root = ET.fromstring(xml_text)
+    locations = [element.text.strip() for element in root.iter()
+                 if element.tag.rsplit('}', 1)[-1] == 'loc' and element.text]
+    if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+        return [], locations
+    return locations, []
+
+def parse_feed(xml_text, base_url=''):
+    """
+    Parse post links from an RSS or Atom feed
+    
+    Args:
+        xml_text (str): Feed XML
+        base_url (str): URL of the feed, used to resolve relative links
+        
+    Returns:
+        list: List of post URLs
+    """
+    root = ET.fromstring(xml_text)
+    urls = []
+    for element in root.iter():
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'item':
+            # RSS: <item><link>https://...</link></item>
+            link = next((child.text for child in element
+                         if child.tag.rsplit('}', 1)[-1] == 'link' and child.text), None)
+        elif tag == 'entry':
+            # Atom: <entry><link rel="alternate" href="https://..."/></entry>
+            link = next((child.get('href') for child in element
+                         if child.tag.rsplit('}', 1)[-1] == 'link'
+                         and child.get('rel', 'alternate') == 'alternate'), None)
+        else:
+            continue
+        if link:
+            urls.append(urljoin(base_url, link.strip()))
+    return urls
+
+def collect_urls(enhancer, url=None, url_file=None, sitemap=None, feed=None):
+    """
+    Gather post URLs from the command line, a list file, a sitemap and a feed
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer whose session fetches sitemaps and feeds
+        url (str): Single post URL
+        url_file (str): Path of a file with one URL per line
+        sitemap (str): Sitemap or sitemap index URL
+        feed (str): RSS or Atom feed URL
+        
+    Returns:
+        list: Unique post URLs, in discovery order
+    """
+    urls = [url] if url else []
+    if url_file:
+        urls.extend(read_url_list(url_file))
+    
+    pending_sitemaps = [sitemap] if sitemap else []
+    seen_sitemaps = set()
+    while pending_sitemaps:
+        sitemap_url = pending_sitemaps.pop(0)
+        if sitemap_url in seen_sitemaps:
+            continue
+        seen_sitemaps.add(sitemap_url)
+        response = enhancer.session.get(sitemap_url, timeout=enhancer.timeout)
+        response.raise_for_status()
+        pages, children = parse_sitemap(response.content)
+        urls.extend(pages)
+        pending_sitemaps.extend(children)
+    
+    if feed:
+        response = enhancer.session.get(feed, timeout=enhancer.timeout)
+        response.raise_for_status()
+        urls.extend(parse_feed(response.content, feed))
+    
+    return list(dict.fromkeys(urls))
+
+def fetch_posts(enhancer, urls, workers=8, per_host=2):
+    """
+    Extract the content of many posts concurrently
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer that fetches and extracts each post
+        urls (list): Post URLs
+        workers (int): Total number of concurrent requests
+        per_host (int): Maximum concurrent requests to any single host
+        
+    Returns:
+        tuple: ((content, changed) by URL, error message by URL)
+    """
+    host_limits = {urlparse(url).netloc: threading.Semaphore(per_host) for url in urls}
+    
+    def fetch(url):
+        with host_limits[urlparse(url).netloc]:
+            return enhancer.fetch_content(url)
+    
+    contents = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {url: executor.submit(fetch, url) for url in urls}
+        for url, future in futures.items():
+            try:
+                contents[url] = future.result()
+            except Exception as e:
+                errors[url] = str(e)
+    return contents, errors
+
+def post_output_dir(output_dir, url):
+    """
+    Choose a stable, filesystem-safe output subdirectory for a post
+    
+    Args:
+        output_dir (str): Base output directory
+        url (str): Post URL
+        
+    Returns:
+        str: Path of the post's output directory
+    """
+    parsed = urlparse(url)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', parsed.netloc + parsed.path).strip('-').lower()
+    if len(slug) > 80 or not slug:
+        # Keep long names short but still unique per URL
+        slug = slug[:71].rstrip('-') + '-' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(output_dir, slug)
+
+def copy_outputs(enhancer, manifest, url, artifacts, output_dir, keys):
+    """
+    Reuse finished outputs of a post this one nearly duplicates, recording them as done
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer whose metrics record the writes
+        manifest (Manifest): Record of finished stages
+        url (str): URL of the duplicate
+        artifacts (dict): The original's file by stage name, from Manifest.done_artifacts
+        output_dir (str): Output directory of the duplicate
+        keys (dict): The duplicate's fingerprint by stage name
+    """
+    for stage, source in artifacts.items():
+        path = os.path.join(output_dir, STAGES[stage])
+        if os.path.abspath(source) != os.path.abspath(path):
+            with enhancer.metrics.span('write', path=path) as span:
+                with open(source, 'rb') as f:
+                    data = f.read()
+                atomic_write(path, data)
+                span['bytes'] = len(data)
+        manifest.record(url, stage, keys[stage], path)
+
+def stream_file(path, sink):
+    """
+    Send an audio file written earlier to the --stdout stream
+    
+    Args:
+        path (str): Path of the MP3 file
+        sink (file): Binary stream to copy it to
+    """
+    with open(path, 'rb') as f:
+        shutil.copyfileobj(f, sink)
+    sink.flush()
+
+def queue_renditions(transcoder, manifest, url, output_dir, keys, force=False):
+    """
+    Queue the compact renditions of a post's audio files that are not done yet
+    
+    Args:
+        transcoder (Transcoder): Background transcoding queue
+        manifest (Manifest): Records each rendition as a stage named like 'summary_audio:opus-24k'
+        url (str): Post URL
+        output_dir (str): Directory holding the post's audio files
+        keys (dict): The post's stage fingerprints, from stage_keys
+        force (bool): Encode again even if the manifest has the rendition
+    """
+    for stage in ('full_audio', 'summary_audio'):
+        renditions = {profile.name: make_key(keys[stage], **profile.params) for profile in transcoder.profiles}
+        profiles = [profile for profile in transcoder.profiles
+                    if force or not manifest.completed(url, f"{stage}:{profile.name}", renditions[profile.name])]
+        
+        def done(profile, path, error, stage=stage, renditions=renditions):
+            name = f"{stage}:{profile.name}"
+            if error is None:
+                manifest.record(url, name, renditions[profile.name], path)
+            else:
+                manifest.fail(url, name, renditions[profile.name], error)
+                print(f"Error transcoding {path}: {str(error)}")
+                transcoder.metrics.event('error', url=url, stage='transcode', error=str(error))
+        
+        if profiles:
+            transcoder.submit(os.path.join(output_dir, STAGES[stage]), profiles, done)
+
+def summary_settings(enhancer, args):
+    """
+    Collect the settings that change a post's summary, for the manifest
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer doing the work
+        args (argparse.Namespace): Parsed command-line options
+        
+    Returns:
+        dict: Model, generation preset, chunking and reduce settings
+    """
+    return dict(enhancer.preset.cache_params, model=enhancer.model_name,
+                max_chunk_tokens=enhancer.max_chunk_tokens, chunk_overlap=enhancer.chunk_overlap,
+                reduce=args.reduce, summary_length=args.summary_length)
+
+def save_summary(enhancer, path, summary):
+    """
+    Write a summary file, recording the write in the enhancer's metrics
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer whose metrics record the write
+        path (str): Path of the summary file
+        summary (str): Summary text
+    """
+    with enhancer.metrics.span('write', path=path) as span:
+        atomic_write(path, summary)
+        span['bytes'] = len(summary.encode('utf-8'))
+
+def process_batch(enhancer, urls, args, manifest, transcoder=None):
+    """
+    Fetch, summarize and voice many posts, one output subdirectory per post
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer doing the work
+        urls (list): Post URLs
+        args (argparse.Namespace): Parsed command-line options
+        manifest (Manifest): Record of finished stages, used to skip and resume work
+        transcoder (Transcoder): Queue for compact renditions of the audio, or None
+    """
+    print(f"Fetching {len(urls)} posts...")
+    results, errors = fetch_posts(enhancer, urls, args.fetch_workers, args.per_host)
+    for url, error in errors.items():
+        print(f"Skipping {url}: {error}")
+        enhancer.metrics.event('error', url=url, stage='fetch', error=str(error))
+    
+    # A 304 Not Modified only means the text is the same (its cached copy is used);
+    # the manifest decides which stages are stale for the current settings
+    contents = {url: results[url][0] for url in urls if url in results}
+    if enhancer.boilerplate is not None:
+        # Posts fetched before the filter had seen the rest of the site lose their boilerplate now
+        contents = {url: enhancer.boilerplate.filter_text(url, content) for url, content in contents.items()}
+    
+    # Each post resumes from its first stage not yet finished for this text and these settings
+    audio_settings = {'engine': 'gtts', 'lang': args.lang}
+    keys = {url: stage_keys(content, summary_settings(enhancer, args), audio_settings)
+            for url, content in contents.items()}
+    pending = {url: list(STAGES) if args.force else manifest.pending(url, keys[url]) for url in contents}
+    unchanged = [url for url in urls if url in contents and not pending[url]]
+    if unchanged:
+        print(f"Skipping {len(unchanged)} posts unchanged since the last run")
+    if transcoder is not None:
+        # Posts with nothing else to do may still lack renditions in a newly chosen profile
+        for url in unchanged:
+            queue_renditions(transcoder, manifest, url, post_output_dir(args.output_dir, url), keys[url], args.force)
+    
+    fetched = [url for url in urls if url in contents and pending[url]]
+    for url in fetched:
+        manifest.update_post(url, contents[url], post_output_dir(args.output_dir, url))
+    
+    # Near copies of a post processed earlier (in this batch or a previous run) reuse its outputs
+    duplicates = {}
+    if enhancer.near_duplicates is not None:
+        # Only outputs made with the same model, preset and voice can stand in for a post's own
+        settings = make_key(summary_settings(enhancer, args), audio_settings)
+        indexed = set()
+        for url in fetched:
+            signature = minhash(contents[url])
+            match = None if args.force else enhancer.near_duplicates.find(signature, settings, exclude=url)
+            if match and match['result'] not in indexed:
+                # An original from an earlier run must have finished everything this post needs
+                done = manifest.done_artifacts(match['url'], summary_settings(enhancer, args), audio_settings)
+                if not set(pending[url]) <= set(done):
+                    match = None
+            if match:
+                duplicates[url] = match
+                enhancer.metrics.event('duplicate', url=url, of=match['url'], similarity=match['similarity'])
+            else:
+                post_dir = os.path.abspath(post_output_dir(args.output_dir, url))
+                enhancer.near_duplicates.add(url, signature, post_dir, settings)
+                indexed.add(post_dir)
+        if duplicates:
+            print(f"Reusing the outputs of an earlier post for {len(duplicates)} near-duplicate posts")
+        fetched = [url for url in fetched if url not in duplicates]
+    
+    to_summarize = [url for url in fetched if 'summary' in pending[url]]
+    print(f"Creating summaries for {len(to_summarize)} posts...")
+    created = enhancer.create_summaries([contents[url] for url in to_summarize],
+                                        reduce=args.reduce,
+                                        target_length=args.summary_length)
+    
+    # Saved right away, so a failure while synthesizing does not lose the summaries
+    summaries = {}
+    for url in fetched:
+        post_dir = post_output_dir(args.output_dir, url)
+        os.makedirs(post_dir, exist_ok=True)
+        path = os.path.join(post_dir, STAGES['summary'])
+        try:
+            if url in to_summarize:
+                summary = created[to_summarize.index(url)]
+                with manifest.stage(url, 'summary', keys[url]['summary'], path):
+                    save_summary(enhancer, path, summary)
+            else:
+                with open(path, encoding='utf-8') as f:
+                    summary = f.read()
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            enhancer.metrics.event('error', url=url, error=str(e))
+            continue
+        summaries[url] = summary
+    
+    print("Generating audio files...")
+    saved = 0
+    for url, summary in summaries.items():
+        post_dir = post_output_dir(args.output_dir, url)
+        try:
+            for stage, text in (('full_audio', contents[url]), ('summary_audio', summary)):
+                if stage in pending[url]:
+                    path = os.path.join(post_dir, STAGES[stage])
+                    with manifest.stage(url, stage, keys[url][stage], path):
+                        enhancer.create_audio(text, path, args.lang)
+            if transcoder is not None:
+                queue_renditions(transcoder, manifest, url, post_dir, keys[url], args.force)
+            print(f"Saved {url} to {post_dir}")
+            saved += 1
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            enhancer.metrics.event('error', url=url, error=str(e))
+    
+    # After the originals, whose finished outputs are copied; a stage the
+    # original did not finish in this run stays pending for the next one
+    for url, match in duplicates.items():
+        post_dir = post_output_dir(args.output_dir, url)
+        os.makedirs(post_dir, exist_ok=True)
+        try:
+            done = manifest.done_artifacts(match['url'], summary_settings(enhancer, args), audio_settings)
+            copy_outputs(enhancer, manifest, url, {stage: done[stage] for stage in pending[url] if stage in done},
+                         post_dir, keys[url])
+            left = [stage for stage in pending[url] if stage not in done]
+            if left:
+                raise RuntimeError(f"{match['url']}, which it nearly duplicates, did not finish "
+                                   f"{', '.join(STAGES[stage] for stage in left)}")
+            if transcoder is not None:
+                queue_renditions(transcoder, manifest, url, post_dir, keys[url], args.force)
+            print(f"Saved {url} to {post_dir} (near-duplicate of {match['url']})")
+            saved += 1
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            enhancer.metrics.event('error', url=url, error=str(e))
+    
+    print(f"\nProcessing complete! {saved} of {len(urls)} posts saved to {args.output_dir}"
+          f" ({len(unchanged)} unchanged)")
+
+def process_single(enhancer, args, manifest, sink=None, transcoder=None):
+    """
+    Fetch, summarize and voice one post into the output directory
+    
+    Args:
+        enhancer (BlogEnhancer): Enhancer doing the work
+        args (argparse.Namespace): Parsed command-line options
+        manifest (Manifest): Record of finished stages, used to skip and resume work
+        sink (file): Where to stream the audio chosen with --stdout
+        transcoder (Transcoder): Queue for compact renditions of the audio, or None
+    """
+    summary_path = os.path.join(args.output_dir, 'summary.txt')
+    full_audio_path = os.path.join(args.output_dir, 'full_post.mp3')
+    summary_audio_path = os.path.join(args.output_dir, 'summary.mp3')
+    streamed_path = summary_audio_path if args.stdout == 'summary' else full_audio_path
+    
+    # Extract content from URL
+    print(f"Extracting content from {args.url}...")
+    content, _ = enhancer.fetch_content(args.url)
+    # A 304 Not Modified only means the text is the same; the manifest decides
+    # which stages are stale for the current settings
+    audio_settings = {'engine': 'gtts', 'lang': args.lang}
+    keys = stage_keys(content, summary_settings(enhancer, args), audio_settings)
+    pending = list(STAGES) if args.force else manifest.pending(args.url, keys)
+    if not pending:
+        print("Post unchanged since the last run; nothing to do.")
+        if sink is not None:
+            stream_file(streamed_path, sink)
+        if transcoder is not None:
+            queue_renditions(transcoder, manifest, args.url, args.output_dir, keys, args.force)
+        return
+    manifest.update_post(args.url, content, args.output_dir)
+    
+    # Only looked up: a single post's output directory is not specific to its URL, so it is not indexed
+    match = None
+    if enhancer.near_duplicates is not None and not args.force:
+        # Only outputs made with the same model, preset and voice can stand in for the post's own
+        settings = make_key(summary_settings(enhancer, args), audio_settings)
+        match = enhancer.near_duplicates.find(minhash(content), settings, exclude=args.url)
+    # Only stages the original finished for its text and these settings can be reused
+    done = manifest.done_artifacts(match['url'], summary_settings(enhancer, args), audio_settings) if match else {}
+    if match and set(pending) <= set(done):
+        print(f"Near-duplicate of {match['url']}; reusing its summary and audio")
+        enhancer.metrics.event('duplicate', url=args.url, of=match['url'], similarity=match['similarity'])
+        copy_outputs(enhancer, manifest, args.url, {stage: done[stage] for stage in pending}, args.output_dir, keys)
+        if sink is not None:
+            stream_file(streamed_path, sink)
+        if transcoder is not None:
+            queue_renditions(transcoder, manifest, args.url, args.output_dir, keys, args.force)
+        return
+
+    # Create summary and save it to file, or reuse the one an interrupted run saved
+    if 'summary' in pending:
+        print("Creating summary...")
+        with manifest.stage(args.url, 'summary', keys['summary'], summary_path):
+            summary = enhancer.create_summary(content, reduce=args.reduce,
+                                              target_length=args.summary_length)
+            save_summary(enhancer, summary_path, summary)
+    else:
+        print("Reusing the summary saved by the last run...")
+        with open(summary_path, encoding='utf-8') as f:
+            summary = f.read()
+
+    # Create audio files
+    print("Generating audio files...")
+    audio_jobs = [('summary', 'summary_audio', summary, summary_audio_path),
+                  ('full', 'full_audio', content, full_audio_path)]
+    # Make the streamed file first so listening can start right away
+    audio_jobs.sort(key=lambda job: job[0] != args.stdout)
+    for kind, stage, text, path in audio_jobs:
+        job_sink = sink if kind == args.stdout else None
+        if stage not in pending:
+            if job_sink is not None:
+                stream_file(path, job_sink)
+            continue
+        with manifest.stage(args.url, stage, keys[stage], path):
+            enhancer.create_audio(text, path, args.lang, job_sink)
+    if transcoder is not None:
+        queue_renditions(transcoder, manifest, args.url, args.output_dir, keys, args.force)
+
+    print(f"\nProcessing complete!")
+    print(f"Summary saved to: {summary_path}")
+    print(f"Full audio saved to: {full_audio_path}")
+    print(f"Summary audio saved to: {summary_audio_path}")
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Create summary and audio from blog post URL')
-    parser.add_argument('url', help='URL of the blog post')
+    parser.add_argument('url', nargs='?', help='URL of the blog post')
+    parser.add_argument('--url-file', help='File with one blog post URL per line')
+    parser.add_argument('--sitemap', help='Sitemap (or sitemap index) URL listing the posts')
+    parser.add_argument('--feed', help='RSS or Atom feed URL listing the posts')
+    parser.add_argument('--fetch-workers', type=int, default=8,
+                       help='Number of posts fetched concurrently in batch mode')
+    parser.add_argument('--per-host', type=int, default=2,
+                       help='Maximum concurrent requests to the same host')
+    parser.add_argument('--timeout', type=float, default=30, help='HTTP timeout in seconds')
+    parser.add_argument('--extractor', default='auto', choices=['auto', 'lxml', 'bs4'],
+                       help='HTML content extractor backend (auto uses lxml when installed)')
+    parser.add_argument('--selectors', default=','.join(DEFAULT_SELECTORS),
+                       help='Comma-separated content container selectors, highest priority first')
+    parser.add_argument('--max-page-mb', type=float, default=10,
+                       help='Skip pages larger than this many megabytes')
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                       help='Keep text blocks that repeat across pages of the same site')
+    parser.add_argument('--boilerplate-min-pages', type=int, default=DEFAULT_MIN_PAGES,
+                       help='Pages of a site a text block must appear on to be dropped as boilerplate')
+    parser.add_argument('--no-dedupe', action='store_true',
+                       help='Process near-duplicate posts instead of reusing the earlier post\'s outputs')
+    parser.add_argument('--duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help='Estimated word 5-gram Jaccard similarity from which posts are near-duplicates')
+    parser.add_argument('--retries', type=int, default=3,
+                       help='Retries with exponential backoff for failed HTTP requests')
     parser.add_argument('--output-dir', default='output', help='Directory to save audio files')
     parser.add_argument('--lang', default='en', help='Language code for audio generation')
+    parser.add_argument('--stdout', choices=['summary', 'full'],
+                       help='Also stream this audio to standard output as it is synthesized '
+                            '(progress messages go to standard error)')
+    parser.add_argument('--backend', default='bart', choices=list(BACKENDS),
+                       help='Summarization model backend (distilled, int8-quantized or ONNX for speed)')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                       help='Generation speed/quality preset: beams, length penalty and summary budgets')
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Number of text chunks summarized per model call')
+    parser.add_argument('--summary-workers', type=int, default=1,
+                       help='Worker processes running the summarization model')
+    parser.add_argument('--torch-threads', type=int,
+                       help='Torch threads per summarization process (default: cores / workers)')
+    parser.add_argument('--max-chunk-tokens', type=int, default=1024,
+                       help="Token budget per chunk (BART's context window is 1024)")
+    parser.add_argument('--chunk-overlap', type=int, default=0,
+                       help='Sentences repeated between consecutive chunks')
+    parser.add_argument('--reduce', action='store_true',
+                       help='Summarize the chunk summaries until the summary fits --summary-length')
+    parser.add_argument('--summary-length', type=int, default=150,
+                       help='Maximum summary length in tokens when using --reduce')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help='Directory for the on-disk summary, audio and HTTP caches')
+    parser.add_argument('--cache-size-mb', type=int, default=64,
+                       help='Size cap for cached summaries before least recently used entries are evicted')
+    parser.add_argument('--audio-cache-size-mb', type=int, default=512,
+                       help='Size cap for cached audio segments before least recently used entries are evicted')
+    parser.add_argument('--tts-concurrency', type=int, default=4,
+                       help='Number of text segments synthesized at once')
+    parser.add_argument('--tts-retries', type=int, default=2,
+                       help='Retries with exponential backoff for a failed segment')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the summary, audio and HTTP caches')
+    parser.add_argument('--metrics', metavar='PATH',
+                       help="Write per-stage timings as JSON lines to PATH ('-' for standard error)")
+    parser.add_argument('--profile', metavar='PATH',
+                       help='Profile summarization with cProfile and write the stats to PATH')
+    parser.add_argument('--force', action='store_true',
+                       help='Reprocess posts even if they are unchanged since the last run')
+    parser.add_argument('--audio-profile', metavar='NAMES',
+                       help=f"Also encode the audio into these comma-separated compact profiles with ffmpeg "
+                            f"({', '.join(PROFILES)})")
+    parser.add_argument('--transcode-workers', type=int,
+                       help='Audio files encoded at once for --audio-profile (default: one per core)')
     
     args = parser.parse_args()
+    batch_mode = bool(args.url_file or args.sitemap or args.feed)
+    if not (args.url or batch_mode):
+        parser.error('provide a URL, --url-file, --sitemap or --feed')
+    if args.stdout and batch_mode:
+        parser.error('--stdout only works with a single URL')
+    try:
+        profiles = get_profiles(args.audio_profile) if args.audio_profile else []
+    except ValueError as e:
+        parser.error(str(e))
+    if profiles and shutil.which('ffmpeg') is None:
+        parser.error('--audio-profile needs ffmpeg on the PATH')
     
     # Create output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
     
-    enhancer = BlogEnhancer()
+    summary_cache = None
+    audio_cache = None
+    http_cache = None
+    if not args.no_cache:
+        summary_cache = SummaryCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 * 1024)
+        audio_cache = AudioCache(args.cache_dir, max_bytes=args.audio_cache_size_mb * 1024 * 1024)
+        http_cache = HttpCache(args.cache_dir)
+    # Without the caches, both are kept in memory for this run only
+    state_dir = None if args.no_cache else args.cache_dir
+    boilerplate = None if args.keep_boilerplate else BoilerplateFilter(state_dir, args.boilerplate_min_pages)
+    near_duplicates = None if args.no_dedupe else NearDuplicateIndex(state_dir, args.duplicate_threshold)
     
-    try:
-        # Extract content from URL
-        print(f"Extracting content from {args.url}...")
-        content = enhancer.extract_content_from_url(args.url)
-        
-        # Create summary
-        print("Creating summary...")
-        summary = enhancer.create_summary(content)
-        
-        # Save summary to file
-        summary_path = os.path.join(args.output_dir, 'summary.txt')
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(summary)
-        
-        # Create audio files
-        print("Generating audio files...")
-        full_audio_path = os.path.join(args.output_dir, 'full_post.mp3')
-        summary_audio_path = os.path.join(args.output_dir, 'summary.mp3')
-        
-        enhancer.create_audio(content, full_audio_path, args.lang)
-        enhancer.create_audio(summary, summary_audio_path, args.lang)
-        
-        print(f"\nProcessing complete!")
-        print(f"Summary saved to: {summary_path}")
-        print(f"Full audio saved to: {full_audio_path}")
-        print(f"Summary audio saved to: {summary_audio_path}")
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
+    # What earlier runs into this output directory finished
+    manifest = Manifest(os.path.join(args.output_dir, MANIFEST_NAME))
+    
+    metrics = Metrics(args.metrics, args.profile)
+    enhancer = BlogEnhancer(batch_size=args.batch_size,
+                            metrics=metrics,
+                            backend=get_backend(args.backend),
+                            preset=get_preset(args.preset),
+                            max_chunk_tokens=args.max_chunk_tokens,
+                            chunk_overlap=args.chunk_overlap,
+                            summary_cache=summary_cache,
+                            audio_cache=audio_cache,
+                            tts_concurrency=args.tts_concurrency,
+                            tts_retries=args.tts_retries,
+                            http_cache=http_cache,
+                            extractor=get_extractor(args.extractor, args.selectors.split(','),
+                                                    int(args.max_page_mb * 1024 * 1024)),
+                            boilerplate=boilerplate,
+                            near_duplicates=near_duplicates,
+                            timeout=args.timeout,
+                            retries=args.retries,
+                            pool_size=args.fetch_workers)
+    if args.summary_workers > 1:
+        enhancer.worker_pool = SummaryWorkerPool(enhancer, args.summary_workers, args.torch_threads)
+    elif args.torch_threads:
+        set_torch_threads(args.torch_threads)
+    # Encodes in the background while the next posts are summarized and voiced
+    transcoder = Transcoder(profiles, args.transcode_workers, metrics) if profiles else None
+    
+    # Keep standard output clean for the audio stream
+    sink = sys.stdout.buffer if args.stdout else None
+    with contextlib.redirect_stdout(sys.stderr if args.stdout else sys.stdout):
+        try:
+            if batch_mode:
+                urls = collect_urls(enhancer, args.url, args.url_file, args.sitemap, args.feed)
+                process_batch(enhancer, urls, args, manifest, transcoder)
+            else:
+                process_single(enhancer, args, manifest, sink, transcoder)
+            if transcoder is not None:
+                print("Waiting for audio transcoding to finish...")
+                print(format_renditions(transcoder.wait()))
+            
+            if summary_cache is not None:
+                stats = summary_cache.stats()
+                print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses")
+            if audio_cache is not None:
+                stats = audio_cache.stats()
+                print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses")
+            if boilerplate is not None:
+                stats = boilerplate.stats()
+                print(f"Boilerplate: {stats['blocks']} blocks ({stats['chars']} characters) "
+                      f"dropped from {stats['pages']} pages")
+            if enhancer.worker_pool is not None:
+                print(format_memory(enhancer.worker_pool.memory()))
+            
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            metrics.event('error', error=str(e))
+        finally:
+            if enhancer.worker_pool is not None:
+                enhancer.worker_pool.close()
+            if transcoder is not None:
+                transcoder.close()
+            manifest.close()
+            metrics.close()
+            if args.profile:
+                print(f"Profile written to {args.profile} (view with: python -m pstats {args.profile})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
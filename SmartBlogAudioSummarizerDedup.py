@@ -0,0 +1,319 @@
+import array
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+"""
+Boilerplate removal and near-duplicate detection for the Smart Blog Audio
+Summarizer scripts.
+
+BoilerplateFilter learns which text blocks (see Extractor.extract_blocks)
+repeat across pages of the same site: share widgets, "related posts" lists,
+newsletter prompts, author bios and footers. A block found on min_pages or
+more distinct pages of a host is dropped before the post is summarized or
+read aloud. Digits are ignored when comparing blocks, so "12 comments" and
+"3 comments" count as the same block. The filter learns as pages are
+fetched, so the first pages of a site it has never seen keep their
+boilerplate until they are filtered again with filter_text(), which is why
+cleaned text keeps one block per line. With a cache directory what it
+learned carries over to the next run.
+
+NearDuplicateIndex finds posts whose text is nearly the same as a post that
+was already processed (syndicated copies, reposts, AMP and print versions).
+Each post is reduced to a MinHash signature of its word 5-grams, and
+locality-sensitive hashing over bands of the signature finds candidates
+without comparing every pair. A candidate whose estimated Jaccard
+similarity reaches the threshold is a duplicate and its outputs are reused.
+Entries carry a fingerprint of the settings the outputs were made with
+(model, preset, TTS engine, voice, ...), and only posts processed with the
+same settings are matched. The scripts copy only the outputs the manifest
+records as done for the original post; the rest stay pending.
+"""
+
+DEFAULT_MIN_PAGES = 3
+DEFAULT_THRESHOLD = 0.8
+
+# 64 hash functions in 16 bands of 4 rows: posts with 0.8 Jaccard similarity
+# share a band (and become candidates) with probability > 0.999
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERM)]
+
+
+def _block_hash(block):
+    """Identify a block by its text, ignoring case and digits"""
+    normalized = re.sub(r'\d+', '0', block.lower())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class BoilerplateFilter:
+    def __init__(self, cache_dir=None, min_pages=DEFAULT_MIN_PAGES):
+        """
+        Open (or create) the boilerplate block statistics
+
+        Args:
+            cache_dir (str): Directory holding the database, or None to keep it in memory for this run
+            min_pages (int): Distinct pages of a host a block must appear on to count as boilerplate
+        """
+        self.min_pages = min_pages
+        self.pages = set()
+        self.dropped_blocks = 0
+        self.dropped_chars = 0
+        self._lock = threading.Lock()
+        if cache_dir is None:
+            self.path = ':memory:'
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, 'boilerplate.sqlite3')
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS block_pages (
+                host TEXT NOT NULL,
+                block TEXT NOT NULL,
+                url TEXT NOT NULL,
+                PRIMARY KEY (host, block, url)
+            )
+        """)
+        self._db.commit()
+
+    def clean(self, url, blocks):
+        """
+        Learn a page's blocks and return its text without the boilerplate ones
+
+        Args:
+            url (str): Page URL; blocks are only compared with pages of the same host
+            blocks (list): Text blocks from Extractor.extract_blocks
+
+        Returns:
+            str: The remaining blocks, one per line
+        """
+        if not blocks:
+            return ""
+        host = urlparse(url).netloc
+        with self._lock:
+            self._db.executemany("INSERT OR IGNORE INTO block_pages (host, block, url) VALUES (?, ?, ?)",
+                                 [(host, block, url) for block in dict.fromkeys(map(_block_hash, blocks))])
+            self._db.commit()
+        return self.filter_text(url, '\n'.join(blocks))
+
+    def filter_text(self, url, text):
+        """
+        Drop the blocks of a cleaned text that are now known to be boilerplate
+
+        Args:
+            url (str): Page URL
+            text (str): Text returned by clean(), one block per line
+
+        Returns:
+            str: The remaining blocks, one per line (all of them if every block was boilerplate)
+        """
+        blocks = text.split('\n')
+        host = urlparse(url).netloc
+        hashes = [_block_hash(block) for block in blocks]
+        unique = list(dict.fromkeys(hashes))
+        counts = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                counts.update(self._db.execute(
+                    f"SELECT block, COUNT(*) FROM block_pages WHERE host = ? AND block IN ({placeholders}) "
+                    f"GROUP BY block", [host] + batch))
+
+        kept = [block for block, block_hash in zip(blocks, hashes) if counts.get(block_hash, 0) < self.min_pages]
+        if not kept:
+            # A page made only of repeated blocks (an index or tag page) is left as it is
+            kept = blocks
+        with self._lock:
+            self.pages.add(url)
+            self.dropped_blocks += len(blocks) - len(kept)
+            self.dropped_chars += sum(map(len, blocks)) - sum(map(len, kept))
+        return '\n'.join(kept)
+
+    def stats(self):
+        """
+        Report what the filter removed in this run
+
+        Returns:
+            dict: Pages cleaned, blocks and characters dropped
+        """
+        with self._lock:
+            return {'pages': len(self.pages), 'blocks': self.dropped_blocks, 'chars': self.dropped_chars}
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._db.close()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Split a text into overlapping word n-grams
+
+    Args:
+        text (str): Text to split
+        size (int): Words per shingle
+
+    Returns:
+        set: Shingles as strings (one shingle of all words for texts shorter than size)
+    """
+    words = re.findall(r'\w+', text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """
+    Compute a text's MinHash signature
+
+    Args:
+        text (str): Post content
+
+    Returns:
+        array: NUM_PERM minimum hash values, or None for a text without words
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+              for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return array.array('Q', [min((a * value + b) % _MERSENNE_PRIME for value in hashes) & _MAX_HASH
+                             for a, b in _PERMUTATIONS])
+
+
+def similarity(first, second):
+    """
+    Estimate the Jaccard similarity of two texts from their signatures
+
+    Args:
+        first (array): MinHash signature
+        second (array): MinHash signature
+
+    Returns:
+        float: Fraction of equal hash values, between 0 and 1
+    """
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def _buckets(signature):
+    """LSH bucket of each band of a signature"""
+    rows = len(signature) // BANDS
+    return [(band, hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                   digest_size=8).hexdigest())
+            for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    def __init__(self, cache_dir=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Open (or create) the index of processed posts
+
+        Args:
+            cache_dir (str): Directory holding the database, or None to keep it in memory for this run
+            threshold (float): Estimated Jaccard similarity from which a post is a duplicate
+        """
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        if cache_dir is None:
+            self.path = ':memory:'
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, 'near_duplicates.sqlite3')
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(posts)")]
+        if columns and 'settings' not in columns:
+            # Entries from before settings were recorded cannot be matched safely
+            self._db.execute("DROP TABLE posts")
+            self._db.execute("DROP TABLE IF EXISTS bands")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                url TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                result TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                PRIMARY KEY (url, settings)
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                url TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket, settings)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_url ON bands (url, settings)")
+        self._db.commit()
+
+    def find(self, signature, settings, exclude=None):
+        """
+        Find the processed post most similar to a signature
+
+        Args:
+            signature (array): MinHash signature of the new post
+            settings (str): Fingerprint of the settings the outputs must have been made with
+            exclude (str): URL to ignore (the post's own earlier version)
+
+        Returns:
+            dict: url, result and similarity of the best match at or above the
+                threshold, or None
+        """
+        if signature is None:
+            return None
+        buckets = _buckets(signature)
+        with self._lock:
+            candidates = set()
+            for band, bucket in buckets:
+                candidates.update(url for (url,) in self._db.execute(
+                    "SELECT url FROM bands WHERE band = ? AND bucket = ? AND settings = ?",
+                    (band, bucket, settings)))
+            candidates.discard(exclude)
+            rows = [self._db.execute("SELECT url, signature, result FROM posts WHERE url = ? AND settings = ?",
+                                     (url, settings)).fetchone() for url in candidates]
+
+        best = None
+        for url, stored, result in filter(None, rows):
+            score = similarity(signature, array.array('Q', stored))
+            if score >= self.threshold and (best is None or score > best['similarity']):
+                best = {'url': url, 'result': result, 'similarity': score}
+        return best
+
+    def add(self, url, signature, result, settings):
+        """
+        Record a processed post, replacing its earlier version made with the same settings
+
+        Args:
+            url (str): Post URL
+            signature (array): MinHash signature of the post
+            result (str): Where the post's outputs are (its output directory, stored as an absolute path)
+            settings (str): Fingerprint of the settings the outputs were made with
+        """
+        if signature is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM bands WHERE url = ? AND settings = ?", (url, settings))
+            self._db.execute("INSERT OR REPLACE INTO posts (url, settings, signature, result, added_at) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (url, settings, signature.tobytes(), os.path.abspath(result), time.time()))
+            self._db.executemany("INSERT INTO bands (band, bucket, settings, url) VALUES (?, ?, ?, ?)",
+                                 [(band, bucket, settings, url) for band, bucket in _buckets(signature)])
+            self._db.commit()
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._db.close()
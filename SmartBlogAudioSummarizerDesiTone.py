@@ -1,13 +1,26 @@
-from transformers import pipeline
-import nltk
-from nltk.tokenize import sent_tokenize
 import os
-import requests
-from bs4 import BeautifulSoup
+import re
+import shutil
+import threading
 import argparse
 import asyncio
-import edge_tts  # New: Using Microsoft Edge TTS instead of gTTS
+import itertools
 import json
+from urllib.parse import urlparse
+from SmartBlogAudioSummarizerAudio import (DEFAULT_BREAKS, NATURAL_PAUSES, Mp3Writer, aiter_segments, mark_pauses,
+                                           silence)
+from SmartBlogAudioSummarizerBackends import BACKENDS, DEFAULT_PRESET, PRESETS, get_backend, get_preset
+from SmartBlogAudioSummarizerCache import DEFAULT_CACHE_DIR, AudioCache, HttpCache, SummaryCache, make_key
+from SmartBlogAudioSummarizerCrawl import (copy_outputs, post_output_dir, queue_renditions, read_url_list,
+                                           save_summary, summary_settings)
+from SmartBlogAudioSummarizerDedup import (DEFAULT_MIN_PAGES, DEFAULT_THRESHOLD, BoilerplateFilter,
+                                           NearDuplicateIndex, minhash)
+from SmartBlogAudioSummarizerExtract import DEFAULT_SELECTORS, get_extractor
+from SmartBlogAudioSummarizerManifest import MANIFEST_NAME, STAGES, Manifest, stage_keys
+from SmartBlogAudioSummarizerMetrics import Metrics, profiled
+from SmartBlogAudioSummarizerText import content_key, get_document
+from SmartBlogAudioSummarizerTranscode import PROFILES, Transcoder, format_renditions, get_profiles
+from SmartBlogAudioSummarizerWorkers import SummaryWorkerPool, format_memory, set_torch_threads
 
 """
 # Replaced gTTS with edge-tts for more natural-sounding voice
@@ -24,7 +37,7 @@ import json
 # Volume control
 
 
-# Added prosody marks for more natural pauses
+# Added pauses after sentences (and optionally clauses) for more natural speech
 # Converted to async/await for better audio generation
 
 Install the required packages:
@@ -43,12 +56,29 @@ python blog_enhancer.py https://yourblog.com/your-post-url --voice-type male
 # Adjust speech rate and volume
 python blog_enhancer.py https://yourblog.com/your-post-url --rate "+10%" --volume "+5%"
 
+# Longer pauses between sentences, short ones after commas
+python blog_enhancer.py https://yourblog.com/your-post-url --sentence-break-ms 500 --clause-break-ms 350
+
 # Specify output directory
 python blog_enhancer.py https://yourblog.com/your-post-url --output-dir my_audio_files
 
 # Specify different language (e.g., Spanish)
 python blog_enhancer.py https://yourblog.com/your-post-url --lang es
 
+# Process several posts; fetching, summarization and audio generation overlap
+python blog_enhancer.py https://yourblog.com/post-1 https://yourblog.com/post-2 --queue-size 4
+python blog_enhancer.py --url-file urls.txt --fetch-workers 16 --per-host 4
+
+# Keep blocks repeated across the site's pages, and process near-duplicate posts again
+python blog_enhancer.py --url-file urls.txt --keep-boilerplate --no-dedupe
+
+# Posts unchanged since the last run into the output directory are skipped, and an
+# interrupted run picks up where it stopped; redo everything instead
+python blog_enhancer.py --url-file urls.txt --force
+
+# Also write mono low-bitrate MP3 and Opus copies of the audio (needs ffmpeg)
+python blog_enhancer.py --url-file urls.txt --audio-profile mono-48k,opus-24k
+
 
 The script will:
 
@@ -57,76 +87,273 @@ Generate a summary
 Create audio files for both the full content and summary
 Save everything in the specified output directory (defaults to 'output')
 
-Note: You might need to adjust the possible_content_selectors in the extract_content_from_url method based on your website's HTML structure.
+Note: You might need to adjust the content selectors (--selectors) based on your website's HTML structure.
 
 """
 
+# Safety cap on summarize-the-summaries passes when reducing
+MAX_REDUCE_LEVELS = 6
+
 class BlogEnhancer:
-    def __init__(self):
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        nltk.download('punkt')
+    def __init__(self, batch_size=8, max_chunk_tokens=1024, chunk_overlap=0, summary_cache=None,
+                 audio_cache=None, http_cache=None, timeout=30, retries=3, extractor=None,
+                 tts_concurrency=4, tts_retries=2, breaks=None, worker_pool=None,
+                 backend=None, metrics=None, boilerplate=None, near_duplicates=None, preset=None):
+        self.batch_size = batch_size
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.summary_cache = summary_cache
+        self.audio_cache = audio_cache
+        self.tts_concurrency = tts_concurrency
+        self.tts_retries = tts_retries
+        self.worker_pool = worker_pool
+        self.metrics = metrics or Metrics()
+        # Pause in milliseconds after each punctuation class, see mark_pauses
+        self.breaks = dict(DEFAULT_BREAKS, **(breaks or {}))
+        self.http_cache = http_cache
+        self.extractor = extractor or get_extractor()
+        # Optional BoilerplateFilter and NearDuplicateIndex, see SmartBlogAudioSummarizerDedup
+        self.boilerplate = boilerplate
+        self.near_duplicates = near_duplicates
+        self.timeout = timeout
+        self.retries = retries
+        self.backend = backend or get_backend('bart')
+        self.model_name = self.backend.cache_name
+        self._summarizer = None
+        self.preset = preset or get_preset()
+        self._session = None
+        self._session_lock = threading.Lock()
         # New: Define available Indian English voices
         self.indian_voices = {
             "male": "en-IN-PrabhatNeural",  # Male Indian English voice
             "female": "en-IN-NeerjaNeural"  # Female Indian English voice
         }
+    
+    @property
+    def summarizer(self):
+        """The summarization pipeline, loaded on first use"""
+        if self._summarizer is None:
+            self._summarizer = self.backend.load()
+        return self._summarizer
         
+    @property
+    def session(self):
+        """Shared keep-alive HTTP session with retries, created on first use"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                retry = Retry(total=self.retries, backoff_factor=0.5,
+                              status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=('GET', 'HEAD'))
+                session = requests.Session()
+                session.mount('http://', HTTPAdapter(max_retries=retry))
+                session.mount('https://', HTTPAdapter(max_retries=retry))
+                self._session = session
+            return self._session
+    
+    @property
+    def extraction_settings(self):
+        """Fingerprint of everything that changes a page's extracted text, for the HTTP cache"""
+        return make_key(self.extractor.name, self.extractor.selectors, max_bytes=self.extractor.max_bytes,
+                        boilerplate_min_pages=self.boilerplate.min_pages if self.boilerplate is not None else None)
+    
     def extract_content_from_url(self, url):
         """Extract the main content from a blog post URL"""
+        return self.fetch_content(url)[0]
+    
+    def fetch_content(self, url):
+        """Extract the main content from a blog post URL, revalidating cached copies
+        
+        Returns (content, changed); changed is False when the server answered
+        304 Not Modified to the cached ETag/Last-Modified validators.
+        """
+        response, cached = self.download(url)
+        if response is None:
+            return self.cached_content(url, cached), False
+        return self.extract_response(url, response), True
+    
+    def download(self, url):
+        """Download a blog post page, sending the cached validators if there are any
+        
+        Returns (response, cached entry); response is None when the server
+        answered 304 Not Modified and the cached content is still current.
+        """
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            content = ""
-            
-            possible_content_selectors = [
-                'article',
-                '.post-content',
-                '.entry-content',
-                '.content',
-                'main',
-                '#content'
-            ]
-            
-            for selector in possible_content_selectors:
-                content_element = soup.select_one(selector)
-                if content_element:
-                    content = content_element.get_text()
-                    break
-            
-            if not content:
-                content = soup.body.get_text()
+            cached = self.http_cache.get(url, self.extraction_settings) if self.http_cache is not None else None
+            headers = self.http_cache.conditional_headers(cached) if cached else {}
             
-            lines = (line.strip() for line in content.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            content = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return content
+            with self.metrics.span('fetch', url=url) as span:
+                response = self.session.get(url, timeout=self.timeout, headers=headers)
+                span['status'] = response.status_code
+                span['bytes'] = len(response.content)
+            if cached and response.status_code == 304:
+                return None, cached
+            response.raise_for_status()
+            return response, cached
             
         except Exception as e:
             raise Exception(f"Error extracting content from URL: {str(e)}")
+    
+    def extract_response(self, url, response):
+        """Extract the main content from a downloaded page and remember its validators"""
+        try:
+            with self.metrics.span('parse', url=url, bytes=len(response.content)) as span:
+                content = self._extract_text(response.text, url)
+                span['chars'] = len(content)
+        except Exception as e:
+            raise Exception(f"Error extracting content from URL: {str(e)}")
+        if self.http_cache is not None:
+            self.http_cache.put(url, response.headers.get('ETag'),
+                                response.headers.get('Last-Modified'), content, self.extraction_settings)
+        return content
+    
+    def cached_content(self, url, cached):
+        """The text extracted on an earlier fetch, without blocks since learned to be boilerplate"""
+        if self.boilerplate is not None:
+            return self.boilerplate.filter_text(url, cached['content'])
+        return cached['content']
+    
+    def _extract_text(self, html, url=None):
+        """Extract the main content from a blog post's HTML, dropping the site's boilerplate blocks"""
+        if self.boilerplate is not None and url is not None:
+            return self.boilerplate.clean(url, self.extractor.extract_blocks(html))
+        return self.extractor.extract(html)
 
-    def create_summary(self, text, max_length=150, min_length=50):
+    def create_summary(self, text, max_length=150, min_length=50, reduce=False, target_length=None):
         """Create a summary of the blog post text"""
-        chunks = self._chunk_text(text)
+        return self.create_summaries([text], max_length, min_length, reduce, target_length)[0]
+    
+    @profiled
+    def create_summaries(self, texts, max_length=150, min_length=50, reduce=False, target_length=None):
+        """Create summaries for several posts, batching chunks across posts
+        
+        With reduce=True the chunk summaries are re-chunked and summarized
+        again until each summary fits target_length tokens.
+        """
+        with self.metrics.span('chunk', posts=len(texts), chars=sum(len(text) for text in texts)) as span:
+            chunked = [self._chunk_text(text) for text in texts]
+            span['chunks'] = sum(len(chunks) for chunks in chunked)
+        summaries = self._summarize_posts(chunked, max_length, min_length)
+        if not reduce:
+            return summaries
+        
+        if target_length is None:
+            target_length = max_length
+        
+        # Re-chunk and summarize the joined summaries, one batched pass per level
+        for _ in range(MAX_REDUCE_LEVELS):
+            pending = [i for i, summary in enumerate(summaries)
+                       if self._count_tokens(summary) > target_length]
+            if not pending:
+                break
+            
+            rechunked = {i: self._chunk_text(summaries[i]) for i in pending}
+            # Posts down to a single chunk are summarized straight to the target length
+            final = [i for i in pending if len(rechunked[i]) == 1]
+            intermediate = [i for i in pending if len(rechunked[i]) > 1]
+            
+            for posts, level_max, level_min in (
+                    (final, target_length, min(min_length, target_length // 2)),
+                    (intermediate, max_length, min_length)):
+                reduced = self._summarize_posts([rechunked[i] for i in posts], level_max, level_min)
+                for i, summary in zip(posts, reduced):
+                    summaries[i] = summary
+        
+        return summaries
+    
+    def _summarize_posts(self, chunked, max_length, min_length):
+        """Summarize the chunks of several posts in one batched pass"""
+        flat_chunks = [chunk for chunks in chunked for chunk in chunks]
+        flat_summaries = self._summarize_chunks(flat_chunks, max_length, min_length)
+        
         summaries = []
+        position = 0
+        for chunks in chunked:
+            summaries.append(" ".join(flat_summaries[position:position + len(chunks)]))
+            position += len(chunks)
+        
+        return summaries
+    
+    def _summarize_chunks(self, chunks, max_length, min_length):
+        """Summarize chunks in batches of similar token length, keeping input order"""
+        if not chunks:
+            return []
+        
+        generate_kwargs = self.preset.generate_kwargs
+        summaries = [None] * len(chunks)
+        
+        # Reuse cached summaries and only run the model on the remaining chunks
+        keys = None
+        if self.summary_cache is not None:
+            keys = [self.summary_cache.make_key(content_key(chunk), self.model_name, max_length, min_length,
+                                                **self.preset.cache_params)
+                    for chunk in chunks]
+            with self.metrics.span('summary_cache', lookups=len(keys)) as span:
+                cached = self.summary_cache.get_many(keys)
+                span['hits'] = len(cached)
+            for i, key in enumerate(keys):
+                summaries[i] = cached.get(key)
+        todo = [i for i in range(len(chunks)) if summaries[i] is None]
+        if not todo:
+            return summaries
         
-        for chunk in chunks:
-            summary = self.summarizer(chunk, 
-                                    max_length=max_length, 
-                                    min_length=min_length, 
-                                    do_sample=False)[0]['summary_text']
-            summaries.append(summary)
+        if self.worker_pool is not None:
+            # Shard the model calls across worker processes, balanced by token count
+            with self.metrics.span('generate', chunks=len(todo), workers=self.worker_pool.workers):
+                results = self.worker_pool.summarize([chunks[i] for i in todo], max_length, min_length)
+            for i, summary in zip(todo, results):
+                summaries[i] = summary
+            if keys is not None:
+                self.summary_cache.put_many({keys[i]: summaries[i] for i in todo})
+            return summaries
         
-        return " ".join(summaries)
+        # Each chunk's summary budget follows its token count
+        lengths = [len(ids) for ids in self.summarizer.tokenizer([chunks[i] for i in todo])['input_ids']]
+        token_counts = dict(zip(todo, lengths))
+        budgets = {i: self.preset.budget(token_counts[i], max_length, min_length) for i in todo}
+        # A chunk already no longer than its summary could be is kept as it is
+        short = [i for i in todo if self.preset.length_ratio is not None and token_counts[i] <= budgets[i][0]]
+        for i in short:
+            summaries[i] = ' '.join(chunks[i].split())
+        if keys is not None and short:
+            self.summary_cache.put_many({keys[i]: summaries[i] for i in short})
+        
+        # Batch chunks with the same budget, sorted by token length so each batch pads to roughly the same size
+        order = sorted((i for i in todo if summaries[i] is None), key=lambda i: (budgets[i], token_counts[i]))
+        batches = []
+        for budget, group in itertools.groupby(order, key=budgets.get):
+            group = list(group)
+            batches.extend((budget, group[start:start + self.batch_size])
+                           for start in range(0, len(group), self.batch_size))
+        
+        for (batch_max, batch_min), batch in batches:
+            with self.metrics.span('generate', chunks=len(batch), max_length=batch_max,
+                                   tokens_in=sum(token_counts[i] for i in batch)) as span:
+                outputs = self.summarizer([chunks[i] for i in batch],
+                                          max_length=batch_max,
+                                          min_length=batch_min,
+                                          truncation=True,
+                                          batch_size=len(batch),
+                                          **generate_kwargs)
+                if self.metrics.enabled:
+                    span['tokens_out'] = sum(len(ids) for ids in self.summarizer.tokenizer(
+                        [output['summary_text'] for output in outputs], add_special_tokens=False)['input_ids'])
+            for i, output in zip(batch, outputs):
+                summaries[i] = output['summary_text']
+            if keys is not None:
+                self.summary_cache.put_many({keys[i]: summaries[i] for i in batch})
+        
+        return summaries
+
+    def _count_tokens(self, text):
+        """Count the summarizer tokens in a piece of text"""
+        return len(self.summarizer.tokenizer.encode(text, add_special_tokens=False))
     
     # New: Completely revised audio creation method using edge-tts
-    async def create_audio(self, text, output_path, voice_type="male", rate="+0%", volume="+0%"):
+    async def create_audio(self, text, output_path, voice_type="male", rate="+0%", volume="+0%", sink=None):
         """
         Convert text to speech using Microsoft Edge TTS
         
@@ -136,121 +363,547 @@ class BlogEnhancer:
             voice_type (str): "male" or "female" for Indian English voice
             rate (str): Speech rate adjustment (e.g., "+10%", "-10%")
             volume (str): Volume adjustment (e.g., "+10%", "-10%")
+            sink (file): Binary file-like object to also stream the audio to as it is made
         """
         try:
-            # Select the appropriate voice
-            voice = self.indian_voices.get(voice_type, self.indian_voices["male"])
-            
-            # Create communicate object
-            tts = edge_tts.Communicate(text, voice, rate=rate, volume=volume)
-            
-            # Generate audio
-            await tts.save(output_path)
-            
-            # Add prosody marks for more natural pauses
-            await self._add_prosody_marks(output_path)
+            with self.metrics.span('audio', path=output_path, chars=len(text)) as span:
+                span['bytes'] = 0
+                async for frames in self.stream_audio(text, output_path, voice_type, rate, volume, sink):
+                    span['bytes'] += len(frames)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"Error creating audio: {str(e)}")
     
-    # New: Method to add prosody marks for more natural speech
-    async def _add_prosody_marks(self, audio_path):
-        """Add prosody marks to make speech more natural"""
+    async def stream_audio(self, text, output_path=None, voice_type="male", rate="+0%", volume="+0%",
+                           sink=None):
+        """Convert text to speech, yielding MP3 audio as soon as each segment is ready"""
+        # Select the appropriate voice
+        voice = self.indian_voices.get(voice_type, self.indian_voices["male"])
+        
+        # Plan pauses on the text, so they are spliced in as the file is written
+        phrases = mark_pauses(text, self.breaks)
+        if not phrases:
+            raise ValueError("No text to convert to speech")
+        
+        # Synthesize per phrase, several at a time, so an edited post only
+        # re-synthesizes the changed parts and long posts finish sooner
+        parts = aiter_segments([phrase for phrase, _ in phrases],
+                               lambda segment: self._segment_audio(segment, voice, rate, volume),
+                               self.tts_concurrency, self.tts_retries)
+        writer = Mp3Writer(output_path, sink)
         try:
-            with open(audio_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Add slight pauses after punctuation
-            content = content.replace('. ', '.<break time="300ms"/> ')
-            content = content.replace('? ', '?<break time="300ms"/> ')
-            content = content.replace('! ', '!<break time="300ms"/> ')
-            content = content.replace(', ', ',<break time="200ms"/> ')
+            index = 0
+            async for data in parts:
+                frames = writer.write(data)
+                pause = phrases[index][1]
+                if pause:
+                    frames += writer.write(silence(frames, pause))
+                index += 1
+                yield frames
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+    
+    async def _segment_audio(self, segment, voice, rate, volume):
+        """Synthesize one text segment, reusing cached audio when available"""
+        with self.metrics.span('tts', chars=len(segment)) as span:
+            key = None
+            data = None
+            if self.audio_cache is not None:
+                key = self.audio_cache.make_key(content_key(segment), engine='edge-tts', voice=voice, rate=rate, volume=volume)
+                data = self.audio_cache.get(key)
+            span['cached'] = data is not None
             
-            with open(audio_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-                
-        except Exception:
-            # If error occurs, continue with original audio
-            pass
+            if data is None:
+                data = await self._synthesize(segment, voice, rate, volume)
+                if key is not None:
+                    self.audio_cache.put(key, data)
+            span['bytes'] = len(data)
+        return data
     
-    def _chunk_text(self, text, max_chars=1000):
-        """Split text into smaller chunks for processing"""
-        sentences = sent_tokenize(text)
+    async def _synthesize(self, segment, voice, rate, volume):
+        """Call the TTS service for one text segment and return its MP3 data"""
+        import edge_tts  # New: Using Microsoft Edge TTS instead of gTTS
+        
+        data = bytearray()
+        async for chunk in edge_tts.Communicate(segment, voice, rate=rate, volume=volume).stream():
+            if chunk["type"] == "audio":
+                data.extend(chunk["data"])
+        return bytes(data)
+    
+    def _chunk_text(self, text, max_tokens=None, overlap=None):
+        """Split text into sentence-aligned chunks that fill the model's token budget"""
+        tokenizer = self.summarizer.tokenizer
+        if max_tokens is None:
+            max_tokens = self.max_chunk_tokens
+        if overlap is None:
+            overlap = self.chunk_overlap
+        # Leave room for the special tokens the model adds around every input
+        budget = max_tokens - tokenizer.num_special_tokens_to_add()
+        
+        # Sentences come from the shared index, so a post is only run through Punkt once
+        document = get_document(text)
+        if not len(document):
+            return []
+        
+        # Count each sentence with the leading space it gets once joined
+        lengths = [len(ids) for ids in tokenizer([" " + sentence for sentence in document],
+                                                 add_special_tokens=False)['input_ids']]
+        # Units are (start, end, tokens, sentence index); pieces of split sentences have no index
+        units = []
+        for index, length in enumerate(lengths):
+            if length <= budget:
+                units.append((document.starts[index], document.ends[index], length, index))
+            else:
+                units.extend(self._split_sentence(document, index, budget))
+        
         chunks = []
         current_chunk = []
         current_length = 0
         
-        for sentence in sentences:
-            if current_length + len(sentence) <= max_chars:
-                current_chunk.append(sentence)
-                current_length += len(sentence)
-            else:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-                current_length = len(sentence)
+        for position, unit in enumerate(units):
+            length = unit[2]
+            if current_chunk and current_length + length > budget:
+                chunks.append(self._passage(document, [units[i] for i in current_chunk]))
+                # Repeat the last few sentences for context, as long as they leave room
+                current_chunk = current_chunk[-overlap:] if overlap > 0 else []
+                current_length = sum(units[i][2] for i in current_chunk)
+                while current_chunk and current_length + length > budget:
+                    current_length -= units[current_chunk.pop(0)][2]
+            current_chunk.append(position)
+            current_length += length
         
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            chunks.append(self._passage(document, [units[i] for i in current_chunk]))
             
         return chunks
 
+    def _split_sentence(self, document, index, budget):
+        """Split a sentence that does not fit the token budget into (start, end, tokens, None) pieces on word boundaries"""
+        start, end = document.starts[index], document.ends[index]
+        words = [match.span() for match in re.finditer(r'\S+', document.text[start:end])]
+        lengths = [len(ids) for ids in self.summarizer.tokenizer(
+            [" " + document.text[start + word_start:start + word_end] for word_start, word_end in words],
+            add_special_tokens=False)['input_ids']]
+        pieces = []
+        piece_start = None
+        current_length = 0
+        
+        # A single word longer than the budget is left whole; the pipeline truncates it
+        for (word_start, word_end), length in zip(words, lengths):
+            if piece_start is not None and current_length + length > budget:
+                pieces.append((piece_start, piece_end, current_length, None))
+                piece_start = None
+                current_length = 0
+            if piece_start is None:
+                piece_start = start + word_start
+            piece_end = start + word_end
+            current_length += length
+        
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, current_length, None))
+        
+        return pieces
+    
+    def _passage(self, document, units):
+        """Join consecutive units into one slice of the document's text, keyed when whole sentences"""
+        if all(unit[3] is not None for unit in units):
+            return document.passage(units[0][3], units[-1][3] + 1)
+        return document.text[units[0][0]:units[-1][1]]
+
+class Post:
+    """A blog post moving through the pipeline stages"""
+    def __init__(self, url, output_dir):
+        self.url = url
+        self.output_dir = output_dir
+        self.content = None
+        self.summary = None
+        # Fingerprint of each stage, and the stages the manifest says are still to do
+        self.keys = None
+        self.pending = list(STAGES)
+        # Match from the NearDuplicateIndex when the outputs of an earlier post are reused
+        self.duplicate_of = None
+
+# New: Staged pipeline so fetching, summarization and audio generation overlap
+async def run_pipeline(enhancer, urls, args, manifest, transcoder=None):
+    """Process posts through fetch -> extract -> summarize -> synthesize -> write stages
+    
+    fetch downloads up to --fetch-workers posts at once (--per-host per
+    site), extract parses them, summarize batches the waiting posts into one
+    model call and saves each summary.txt, synthesize writes full_post.mp3
+    and summary.mp3, and write copies a near-duplicate's outputs and reports
+    each finished post.
+    
+    The stages run concurrently and are connected by bounded queues, so while
+    BART summarizes one post the next is downloading and the previous one is
+    being voiced; a slow stage makes the earlier ones wait instead of piling
+    up posts in memory. Stages the manifest records as done for the same
+    content and settings are skipped. With a transcoder, the compact renditions
+    of each post's audio are encoded in the background.
+    """
+    downloaded = asyncio.Queue(maxsize=args.queue_size)
+    extracted = asyncio.Queue(maxsize=args.queue_size)
+    summarized = asyncio.Queue(maxsize=args.queue_size)
+    synthesized = asyncio.Queue(maxsize=args.queue_size)
+    results = {'saved': 0, 'unchanged': 0, 'failed': 0}
+    # Output directories of posts indexed in this run, whose outputs are not written yet
+    indexed = set()
+    audio_settings = {'engine': 'edge-tts', 'voice_type': args.voice_type, 'rate': args.rate,
+                      'volume': args.volume, 'sentence_break_ms': args.sentence_break_ms,
+                      'clause_break_ms': args.clause_break_ms}
+    # Only outputs made with the same model, preset and voice can stand in for a post's own
+    duplicate_settings = make_key(summary_settings(enhancer, args), audio_settings)
+    
+    def output_dir_for(url):
+        # A single post keeps the old layout; several posts get one subdirectory each
+        return args.output_dir if len(urls) == 1 else post_output_dir(args.output_dir, url)
+    
+    def fail(post_url, error):
+        results['failed'] += 1
+        print(f"Error processing {post_url}: {str(error)}")
+        enhancer.metrics.event('error', url=post_url, error=str(error))
+    
+    async def fetch_stage():
+        workers = asyncio.Semaphore(args.fetch_workers)
+        host_limits = {urlparse(url).netloc: asyncio.Semaphore(args.per_host) for url in urls}
+        
+        async def fetch(url):
+            # A worker is held until its download is queued, so at most
+            # --fetch-workers responses wait on a full queue
+            async with workers:
+                async with host_limits[urlparse(url).netloc]:
+                    print(f"Extracting content from {url}...")
+                    try:
+                        response, cached = await asyncio.to_thread(enhancer.download, url)
+                    except Exception as e:
+                        fail(url, e)
+                        return
+                await downloaded.put((url, response, cached))
+        
+        await asyncio.gather(*(fetch(url) for url in urls))
+        await downloaded.put(None)
+    
+    async def extract_stage():
+        while (item := await downloaded.get()) is not None:
+            url, response, cached = item
+            post = Post(url, output_dir_for(url))
+            if response is None:
+                # Not modified: the cached text is used, and the manifest decides what is stale
+                post.content = enhancer.cached_content(url, cached)
+            else:
+                try:
+                    post.content = await asyncio.to_thread(enhancer.extract_response, url, response)
+                except Exception as e:
+                    fail(url, e)
+                    continue
+            post.keys = stage_keys(post.content, summary_settings(enhancer, args), audio_settings)
+            if not args.force:
+                post.pending = manifest.pending(url, post.keys)
+            if not post.pending:
+                results['unchanged'] += 1
+                print(f"{url} unchanged since the last run; skipping")
+                if transcoder is not None:
+                    # It may still lack renditions in a newly chosen profile
+                    queue_renditions(transcoder, manifest, url, post.output_dir, post.keys, args.force)
+                continue
+            manifest.update_post(url, post.content, post.output_dir)
+            if enhancer.near_duplicates is not None:
+                signature = await asyncio.to_thread(minhash, post.content)
+                match = None if args.force else enhancer.near_duplicates.find(signature, duplicate_settings,
+                                                                              exclude=url)
+                if match and match['result'] not in indexed:
+                    # An original from an earlier run must have finished everything this post needs
+                    done = manifest.done_artifacts(match['url'], summary_settings(enhancer, args), audio_settings)
+                    if not set(post.pending) <= set(done):
+                        match = None
+                if match:
+                    # The original is ahead in the queues, so it is done by the write stage
+                    post.duplicate_of = match
+                    enhancer.metrics.event('duplicate', url=url, of=match['url'], similarity=match['similarity'])
+                elif len(urls) > 1:
+                    # A single post's output directory is not specific to its URL, so it is not indexed
+                    enhancer.near_duplicates.add(url, signature, post.output_dir, duplicate_settings)
+                    indexed.add(os.path.abspath(post.output_dir))
+            await extracted.put(post)
+        await extracted.put(None)
+    
+    async def summarize_stage():
+        finished = False
+        while not finished:
+            # Summarize every post that is already waiting in one batched call
+            posts = [await extracted.get()]
+            while not extracted.empty():
+                posts.append(extracted.get_nowait())
+            if posts[-1] is None:
+                finished = True
+                posts.pop()
+            originals = [post for post in posts if post.duplicate_of is None and 'summary' in post.pending]
+            failed = set()
+            if originals:
+                print(f"Creating summary for {len(originals)} post(s)...")
+                try:
+                    summaries = await asyncio.to_thread(enhancer.create_summaries,
+                                                        [post.content for post in originals],
+                                                        reduce=args.reduce,
+                                                        target_length=args.summary_length)
+                except Exception as e:
+                    for post in originals:
+                        fail(post.url, e)
+                    failed.update(originals)
+                else:
+                    for post, summary in zip(originals, summaries):
+                        post.summary = summary
+            for post in posts:
+                if post in failed:
+                    continue
+                if post.duplicate_of is None:
+                    path = os.path.join(post.output_dir, STAGES['summary'])
+                    try:
+                        if post.summary is not None:
+                            # Saved before the audio, so a failure there does not lose it
+                            os.makedirs(post.output_dir, exist_ok=True)
+                            with manifest.stage(post.url, 'summary', post.keys['summary'], path):
+                                save_summary(enhancer, path, post.summary)
+                        else:
+                            # Written by an earlier run that stopped before the audio was done
+                            with open(path, encoding='utf-8') as f:
+                                post.summary = f.read()
+                    except Exception as e:
+                        fail(post.url, e)
+                        continue
+                await summarized.put(post)
+        await summarized.put(None)
+    
+    async def synthesize(post, stage, text):
+        path = os.path.join(post.output_dir, STAGES[stage])
+        with manifest.stage(post.url, stage, post.keys[stage], path):
+            await enhancer.create_audio(text, path,
+                                        voice_type=args.voice_type,
+                                        rate=args.rate,
+                                        volume=args.volume)
+    
+    async def synthesize_stage():
+        while (post := await summarized.get()) is not None:
+            if post.duplicate_of is not None:
+                await synthesized.put(post)
+                continue
+            print(f"Generating audio files for {post.url}...")
+            os.makedirs(post.output_dir, exist_ok=True)
+            try:
+                # Both files of a post are generated concurrently
+                await asyncio.gather(*(
+                    synthesize(post, stage, text)
+                    for stage, text in (('full_audio', post.content), ('summary_audio', post.summary))
+                    if stage in post.pending))
+            except Exception as e:
+                fail(post.url, e)
+                continue
+            if transcoder is not None:
+                queue_renditions(transcoder, manifest, post.url, post.output_dir, post.keys, args.force)
+            await synthesized.put(post)
+        await synthesized.put(None)
+    
+    async def write_stage():
+        while (post := await synthesized.get()) is not None:
+            if post.duplicate_of is not None:
+                try:
+                    os.makedirs(post.output_dir, exist_ok=True)
+                    # Only what the original finished is copied; the rest stays pending for the next run
+                    done = manifest.done_artifacts(post.duplicate_of['url'], summary_settings(enhancer, args),
+                                                   audio_settings)
+                    copy_outputs(enhancer, manifest, post.url,
+                                 {stage: done[stage] for stage in post.pending if stage in done},
+                                 post.output_dir, post.keys)
+                    left = [stage for stage in post.pending if stage not in done]
+                    if left:
+                        raise RuntimeError(f"{post.duplicate_of['url']}, which it nearly duplicates, did not finish "
+                                           f"{', '.join(STAGES[stage] for stage in left)}")
+                    if transcoder is not None:
+                        queue_renditions(transcoder, manifest, post.url, post.output_dir, post.keys, args.force)
+                except Exception as e:
+                    fail(post.url, e)
+                    continue
+                results['saved'] += 1
+                print(f"Saved {post.url} to {post.output_dir} (near-duplicate of {post.duplicate_of['url']})")
+                continue
+            results['saved'] += 1
+            print(f"Saved {post.url} to {post.output_dir}")
+    
+    await asyncio.gather(fetch_stage(), extract_stage(), summarize_stage(),
+                         synthesize_stage(), write_stage())
+    return results
+
 # New: Modified main function to handle async operations
 async def main():
     parser = argparse.ArgumentParser(description='Create summary and audio from blog post URL')
-    parser.add_argument('url', help='URL of the blog post')
+    parser.add_argument('urls', nargs='*', metavar='url', help='URL of the blog post (several may be given)')
+    parser.add_argument('--url-file', help='File with one blog post URL per line')
+    parser.add_argument('--queue-size', type=int, default=4,
+                       help='Posts buffered between pipeline stages')
+    parser.add_argument('--fetch-workers', type=int, default=8,
+                       help='Number of posts downloaded concurrently')
+    parser.add_argument('--per-host', type=int, default=2,
+                       help='Maximum concurrent requests to the same host')
     parser.add_argument('--output-dir', default='output', help='Directory to save audio files')
     parser.add_argument('--voice-type', default='male', choices=['male', 'female'], 
                        help='Voice type for audio generation')
-    parser.add_argument('--rate', default='+0%', help='Speech rate adjustment (e.g., +10%, -10%)')
-    parser.add_argument('--volume', default='+0%', help='Volume adjustment (e.g., +10%, -10%)')
+    parser.add_argument('--rate', default='+0%', help='Speech rate adjustment (e.g., +10%%, -10%%)')
+    parser.add_argument('--volume', default='+0%', help='Volume adjustment (e.g., +10%%, -10%%)')
+    parser.add_argument('--sentence-break-ms', type=int, default=DEFAULT_BREAKS['sentence'],
+                       help=f'Pause after sentences ending in . ! or ?; values at or below the voice\'s own '
+                            f'{NATURAL_PAUSES["sentence"]} ms pause change nothing')
+    parser.add_argument('--clause-break-ms', type=int, default=DEFAULT_BREAKS['clause'],
+                       help=f'Pause after clauses ending in , ; or :; values at or below the voice\'s own '
+                            f'{NATURAL_PAUSES["clause"]} ms pause change nothing')
+    parser.add_argument('--backend', default='bart', choices=list(BACKENDS),
+                       help='Summarization model backend (distilled, int8-quantized or ONNX for speed)')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                       help='Generation speed/quality preset: beams, length penalty and summary budgets')
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Number of text chunks summarized per model call')
+    parser.add_argument('--summary-workers', type=int, default=1,
+                       help='Worker processes running the summarization model')
+    parser.add_argument('--torch-threads', type=int,
+                       help='Torch threads per summarization process (default: cores / workers)')
+    parser.add_argument('--max-chunk-tokens', type=int, default=1024,
+                       help="Token budget per chunk (BART's context window is 1024)")
+    parser.add_argument('--chunk-overlap', type=int, default=0,
+                       help='Sentences repeated between consecutive chunks')
+    parser.add_argument('--reduce', action='store_true',
+                       help='Summarize the chunk summaries until the summary fits --summary-length')
+    parser.add_argument('--summary-length', type=int, default=150,
+                       help='Maximum summary length in tokens when using --reduce')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help='Directory for the on-disk summary, audio and HTTP caches')
+    parser.add_argument('--cache-size-mb', type=int, default=64,
+                       help='Size cap for cached summaries before least recently used entries are evicted')
+    parser.add_argument('--audio-cache-size-mb', type=int, default=512,
+                       help='Size cap for cached audio segments before least recently used entries are evicted')
+    parser.add_argument('--tts-concurrency', type=int, default=4,
+                       help='Number of text segments synthesized at once')
+    parser.add_argument('--tts-retries', type=int, default=2,
+                       help='Retries with exponential backoff for a failed segment')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the summary, audio and HTTP caches')
+    parser.add_argument('--metrics', metavar='PATH',
+                       help="Write per-stage timings as JSON lines to PATH ('-' for standard error)")
+    parser.add_argument('--profile', metavar='PATH',
+                       help='Profile summarization with cProfile and write the stats to PATH')
+    parser.add_argument('--force', action='store_true',
+                       help='Reprocess posts even if they are unchanged since the last run')
+    parser.add_argument('--timeout', type=float, default=30, help='HTTP timeout in seconds')
+    parser.add_argument('--extractor', default='auto', choices=['auto', 'lxml', 'bs4'],
+                       help='HTML content extractor backend (auto uses lxml when installed)')
+    parser.add_argument('--selectors', default=','.join(DEFAULT_SELECTORS),
+                       help='Comma-separated content container selectors, highest priority first')
+    parser.add_argument('--max-page-mb', type=float, default=10,
+                       help='Skip pages larger than this many megabytes')
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                       help='Keep text blocks that repeat across pages of the same site')
+    parser.add_argument('--boilerplate-min-pages', type=int, default=DEFAULT_MIN_PAGES,
+                       help='Pages of a site a text block must appear on to be dropped as boilerplate')
+    parser.add_argument('--no-dedupe', action='store_true',
+                       help='Process near-duplicate posts instead of reusing the earlier post\'s outputs')
+    parser.add_argument('--duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help='Estimated word 5-gram Jaccard similarity from which posts are near-duplicates')
+    parser.add_argument('--audio-profile', metavar='NAMES',
+                       help=f"Also encode the audio into these comma-separated compact profiles with ffmpeg "
+                            f"({', '.join(PROFILES)})")
+    parser.add_argument('--transcode-workers', type=int,
+                       help='Audio files encoded at once for --audio-profile (default: one per core)')
     
     args = parser.parse_args()
+    urls = list(args.urls)
+    if args.url_file:
+        urls.extend(read_url_list(args.url_file))
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        parser.error('provide at least one URL or --url-file')
+    try:
+        profiles = get_profiles(args.audio_profile) if args.audio_profile else []
+    except ValueError as e:
+        parser.error(str(e))
+    if profiles and shutil.which('ffmpeg') is None:
+        parser.error('--audio-profile needs ffmpeg on the PATH')
     
     os.makedirs(args.output_dir, exist_ok=True)
     
-    enhancer = BlogEnhancer()
+    summary_cache = None
+    audio_cache = None
+    http_cache = None
+    if not args.no_cache:
+        summary_cache = SummaryCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 * 1024)
+        audio_cache = AudioCache(args.cache_dir, max_bytes=args.audio_cache_size_mb * 1024 * 1024)
+        http_cache = HttpCache(args.cache_dir)
+    # Without the caches, both are kept in memory for this run only
+    state_dir = None if args.no_cache else args.cache_dir
+    boilerplate = None if args.keep_boilerplate else BoilerplateFilter(state_dir, args.boilerplate_min_pages)
+    near_duplicates = None if args.no_dedupe else NearDuplicateIndex(state_dir, args.duplicate_threshold)
+    
+    # What earlier runs into this output directory finished
+    manifest = Manifest(os.path.join(args.output_dir, MANIFEST_NAME))
+    
+    metrics = Metrics(args.metrics, args.profile)
+    enhancer = BlogEnhancer(batch_size=args.batch_size,
+                            metrics=metrics,
+                            backend=get_backend(args.backend),
+                            preset=get_preset(args.preset),
+                            max_chunk_tokens=args.max_chunk_tokens,
+                            chunk_overlap=args.chunk_overlap,
+                            summary_cache=summary_cache,
+                            audio_cache=audio_cache,
+                            tts_concurrency=args.tts_concurrency,
+                            tts_retries=args.tts_retries,
+                            breaks={'sentence': args.sentence_break_ms,
+                                    'clause': args.clause_break_ms},
+                            http_cache=http_cache,
+                            extractor=get_extractor(args.extractor, args.selectors.split(','),
+                                                    int(args.max_page_mb * 1024 * 1024)),
+                            boilerplate=boilerplate,
+                            near_duplicates=near_duplicates,
+                            timeout=args.timeout)
+    if args.summary_workers > 1:
+        enhancer.worker_pool = SummaryWorkerPool(enhancer, args.summary_workers, args.torch_threads)
+    elif args.torch_threads:
+        set_torch_threads(args.torch_threads)
+    # Encodes in the background while the next posts are summarized and voiced
+    transcoder = Transcoder(profiles, args.transcode_workers, metrics) if profiles else None
     
     try:
-        print(f"Extracting content from {args.url}...")
-        content = enhancer.extract_content_from_url(args.url)
-        
-        print("Creating summary...")
-        summary = enhancer.create_summary(content)
-        
-        summary_path = os.path.join(args.output_dir, 'summary.txt')
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(summary)
-        
-        print("Generating audio files...")
-        full_audio_path = os.path.join(args.output_dir, 'full_post.mp3')
-        summary_audio_path = os.path.join(args.output_dir, 'summary.mp3')
-        
-        # New: Using async audio creation
-        await enhancer.create_audio(
-            content, 
-            full_audio_path, 
-            voice_type=args.voice_type,
-            rate=args.rate,
-            volume=args.volume
-        )
-        
-        await enhancer.create_audio(
-            summary, 
-            summary_audio_path,
-            voice_type=args.voice_type,
-            rate=args.rate,
-            volume=args.volume
-        )
-        
-        print(f"\nProcessing complete!")
-        print(f"Summary saved to: {summary_path}")
-        print(f"Full audio saved to: {full_audio_path}")
-        print(f"Summary audio saved to: {summary_audio_path}")
+        results = await run_pipeline(enhancer, urls, args, manifest, transcoder)
+        if transcoder is not None:
+            print("Waiting for audio transcoding to finish...")
+            print(format_renditions(await asyncio.to_thread(transcoder.wait)))
+        
+        print(f"\nProcessing complete! {results['saved']} of {len(urls)} posts saved to {args.output_dir}"
+              f" ({results['unchanged']} unchanged, {results['failed']} failed)")
+        if summary_cache is not None:
+            stats = summary_cache.stats()
+            print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses")
+        if audio_cache is not None:
+            stats = audio_cache.stats()
+            print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses")
+        if boilerplate is not None:
+            stats = boilerplate.stats()
+            print(f"Boilerplate: {stats['blocks']} blocks ({stats['chars']} characters) "
+                  f"dropped from {stats['pages']} pages")
+        if enhancer.worker_pool is not None:
+            print(format_memory(enhancer.worker_pool.memory()))
         
     except Exception as e:
         print(f"Error: {str(e)}")
+        metrics.event('error', error=str(e))
+    finally:
+        if enhancer.worker_pool is not None:
+            enhancer.worker_pool.close()
+        if transcoder is not None:
+            transcoder.close()
+        manifest.close()
+        metrics.close()
+        if args.profile:
+            print(f"Profile written to {args.profile} (view with: python -m pstats {args.profile})")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,405 @@
+import argparse
+import glob
+import importlib.util
+import os
+import re
+import time
+
+"""
+Pluggable HTML content extractors for the Smart Blog Audio Summarizer scripts.
+
+Two backends produce the same normalized text:
+
+bs4   BeautifulSoup with the pure-Python 'html.parser' (the original path)
+lxml  lxml's C parser; finds the content container in one walk over the
+      tree (stopping early once the highest-priority selector matches an
+      element with text), drops script/style in C and normalizes
+      whitespace in one pass
+
+Selectors are tried in priority order and support the simple forms
+'tag', '.class', '#id', 'tag.class' and 'tag#id'. The container is the
+first element matching a selector that has any text once script and style
+are removed; when none does, the body is used. Documents larger than
+max_bytes are rejected before parsing.
+
+extract_blocks() returns the same content split into its paragraphs,
+headings, list items and other block elements, without navigation, footers
+and forms, for the boilerplate filter in SmartBlogAudioSummarizerDedup.
+
+Compare the backends on a directory of saved pages, or check that they
+agree on the pages in PARITY_PAGES (and the directory, if given):
+python SmartBlogAudioSummarizerExtract.py saved_pages/ --repeat 5
+python SmartBlogAudioSummarizerExtract.py --check
+"""
+
+DEFAULT_SELECTORS = [
+    'article',
+    '.post-content',
+    '.entry-content',
+    '.content',
+    'main',
+    '#content'
+]
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+
+# Elements that start a new block of text
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'details', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main',
+    'ol', 'p', 'pre', 'section', 'summary', 'table', 'td', 'th', 'tr', 'ul',
+])
+
+# Elements left out of the blocks entirely
+SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'nav', 'footer', 'form'])
+
+# Pages on which the backends have to agree, container fallbacks in particular
+PARITY_PAGES = [
+    '<div class="content"></div><main><p>Main text here.</p></main>',
+    '<article>   </article><div class="post-content"><p>Post text.</p></div>',
+    '<article><script>var x = 1;</script></article><main><p>After a script-only article.</p></main>',
+    '<div class="content"><style>p {}</style></div><div id="content">Fallback by id.</div>',
+    '<body><p>No container at all.</p><nav>Menu</nav><footer>Footer</footer></body>',
+    '<article><h1>Title</h1><p>One <b>bold</b> word.</p><ul><li>First</li><li>Second</li></ul></article>',
+    '<article></article>',
+    '',
+    # XHTML themes open with an XML declaration, which lxml refuses in a str
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" '
+    '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">\n'
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>T</title></head>'
+    '<body><div class="entry-content"><p>XHTML post text.</p></div></body></html>',
+]
+
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+_SELECTOR_PATTERN = re.compile(r'^([A-Za-z][\w-]*)?(?:\.([\w-]+))?(?:#([\w-]+))?$')
+
+
+def parse_selector(selector):
+    """
+    Parse a simple CSS selector
+
+    Args:
+        selector (str): 'tag', '.class', '#id', 'tag.class' or 'tag#id'
+
+    Returns:
+        tuple: (tag, class name, id), with None for the parts not given
+    """
+    match = _SELECTOR_PATTERN.match(selector.strip())
+    if not match or not any(match.groups()):
+        raise ValueError(f"Unsupported content selector: {selector!r}")
+    tag, class_name, element_id = match.groups()
+    return (tag.lower() if tag else None), class_name, element_id
+
+
+class Extractor:
+    name = None
+
+    def __init__(self, selectors=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            selectors (list): Content container selectors, highest priority first
+            max_bytes (int): Largest document accepted, in bytes of UTF-8
+        """
+        self.selectors = list(selectors or DEFAULT_SELECTORS)
+        self.parsed_selectors = [parse_selector(selector) for selector in self.selectors]
+        self.max_bytes = max_bytes
+
+    def extract(self, html):
+        """
+        Extract the main content of a page as normalized text
+
+        Args:
+            html (str): The page's HTML
+
+        Returns:
+            str: The extracted content
+        """
+        raise NotImplementedError
+
+    def extract_blocks(self, html):
+        """
+        Extract the main content of a page as a list of text blocks
+
+        Args:
+            html (str): The page's HTML
+
+        Returns:
+            list: Normalized text of each block element, in document order
+        """
+        raise NotImplementedError
+
+    def _check_size(self, html):
+        """Reject documents over the size limit before spending time parsing them"""
+        # Characters are a lower bound on UTF-8 bytes, so only encode when it matters
+        if len(html) > self.max_bytes or (len(html) * 4 > self.max_bytes
+                                          and len(html.encode('utf-8')) > self.max_bytes):
+            raise ValueError(f"Document is larger than the {self.max_bytes} byte limit")
+
+
+class SoupExtractor(Extractor):
+    name = 'bs4'
+
+    def extract(self, html):
+        from bs4 import BeautifulSoup
+
+        self._check_size(html)
+        container = self._container(BeautifulSoup(html, 'html.parser'))
+        if container is None:
+            return ""
+        return ' '.join(container.get_text().split())
+
+    def extract_blocks(self, html):
+        from bs4 import BeautifulSoup
+
+        self._check_size(html)
+        container = self._container(BeautifulSoup(html, 'html.parser'))
+        if container is None:
+            return []
+
+        blocks = []
+        parts = []
+        self._walk(container, blocks, parts)
+        _flush(blocks, parts)
+        return blocks
+
+    def _container(self, soup):
+        """Find the content container: the first selector match that has text, else body"""
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        for element in map(soup.select_one, self.selectors):
+            if element is not None and element.get_text().strip():
+                return element
+        # Fallback to body if no specific content container found
+        return soup.body
+
+    def _walk(self, element, blocks, parts):
+        from bs4 import NavigableString, Tag
+
+        for child in element.children:
+            if isinstance(child, Tag):
+                if child.name in SKIP_TAGS:
+                    continue
+                is_block = child.name in BLOCK_TAGS
+                if is_block:
+                    _flush(blocks, parts)
+                self._walk(child, blocks, parts)
+                if is_block:
+                    _flush(blocks, parts)
+            elif type(child) is NavigableString:
+                # Comments, CDATA and doctypes are NavigableString subclasses
+                parts.append(str(child))
+
+
+class LxmlExtractor(Extractor):
+    name = 'lxml'
+
+    def extract(self, html):
+        from lxml import etree
+
+        self._check_size(html)
+        if not html.strip():
+            return ""
+        root = self._parse(html)
+        etree.strip_elements(root, 'script', 'style', with_tail=False)
+        container = self._container(root)
+        if container is None:
+            return ""
+        return ' '.join(container.text_content().split())
+
+    def extract_blocks(self, html):
+        from lxml import etree
+
+        self._check_size(html)
+        if not html.strip():
+            return []
+        root = self._parse(html)
+        etree.strip_elements(root, 'script', 'style', with_tail=False)
+        container = self._container(root)
+        if container is None:
+            return []
+
+        blocks = []
+        parts = [container.text or '']
+        self._walk(container, blocks, parts)
+        _flush(blocks, parts)
+        return blocks
+
+    def _parse(self, html):
+        """Parse decoded HTML, dropping an XML declaration that lxml would reject in a str"""
+        import lxml.html
+
+        return lxml.html.document_fromstring(_XML_DECLARATION.sub('', html, count=1))
+
+    def _container(self, root):
+        """Find the content container: the first selector match that has text, else body (script/style already gone)"""
+        from lxml import etree
+
+        # One walk over the elements, remembering the first match for each selector
+        matches = [None] * len(self.parsed_selectors)
+        for element in root.iter(etree.Element):
+            for index, (tag, class_name, element_id) in enumerate(self.parsed_selectors):
+                if matches[index] is not None:
+                    continue
+                if tag and element.tag != tag:
+                    continue
+                if element_id and element.get('id') != element_id:
+                    continue
+                if class_name and class_name not in element.get('class', '').split():
+                    continue
+                matches[index] = element
+                if index == 0 and element.text_content().strip():
+                    # Nothing can beat the highest-priority selector
+                    return element
+
+        # Like select_one, only each selector's first match counts; empty ones fall through
+        for element in matches:
+            if element is not None and element.text_content().strip():
+                return element
+        return root.find('body')
+
+    def _walk(self, element, blocks, parts):
+        for child in element:
+            # Comments and processing instructions have a function as their tag
+            tag = child.tag if isinstance(child.tag, str) else None
+            if tag is not None and tag not in SKIP_TAGS:
+                is_block = tag in BLOCK_TAGS
+                if is_block:
+                    _flush(blocks, parts)
+                parts.append(child.text or '')
+                self._walk(child, blocks, parts)
+                if is_block:
+                    _flush(blocks, parts)
+            parts.append(child.tail or '')
+
+
+def _flush(blocks, parts):
+    """End the current block: normalize the collected text and keep it if not empty"""
+    text = ' '.join(''.join(parts).split())
+    if text:
+        blocks.append(text)
+    parts.clear()
+
+
+EXTRACTORS = {
+    'bs4': SoupExtractor,
+    'lxml': LxmlExtractor,
+}
+
+
+def get_extractor(backend='auto', selectors=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Create a content extractor
+
+    Args:
+        backend (str): 'lxml', 'bs4', or 'auto' for lxml when it is installed
+        selectors (list): Content container selectors, highest priority first
+        max_bytes (int): Largest document accepted
+
+    Returns:
+        Extractor: The extractor
+    """
+    if backend == 'auto':
+        backend = 'lxml' if importlib.util.find_spec('lxml') is not None else 'bs4'
+    if backend not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor backend: {backend!r}")
+    return EXTRACTORS[backend](selectors, max_bytes)
+
+
+def benchmark(pages, backends=('bs4', 'lxml'), repeat=3, selectors=None):
+    """
+    Time each extractor backend on a corpus of saved pages
+
+    Args:
+        pages (list): HTML documents
+        backends (tuple): Backend names to compare
+        repeat (int): Passes over the corpus per backend; the fastest is reported
+        selectors (list): Content container selectors
+
+    Returns:
+        dict: Best total seconds and the extracted texts, per backend
+    """
+    results = {}
+    for backend in backends:
+        extractor = get_extractor(backend, selectors)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            texts = [extractor.extract(html) for html in pages]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[backend] = {'seconds': best, 'texts': texts}
+    return results
+
+
+def check_parity(pages, selectors=None):
+    """
+    Check that the bs4 and lxml backends extract the same text and blocks
+
+    Args:
+        pages (list): HTML documents
+        selectors (list): Content container selectors
+
+    Returns:
+        list: (page index, method, bs4 result, lxml result) for every disagreement
+    """
+    soup = get_extractor('bs4', selectors)
+    lxml = get_extractor('lxml', selectors)
+    mismatches = []
+    for index, html in enumerate(pages):
+        for method in ('extract', 'extract_blocks'):
+            expected = getattr(soup, method)(html)
+            actual = getattr(lxml, method)(html)
+            if expected != actual:
+                mismatches.append((index, method, expected, actual))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare content extractor backends on saved pages')
+    parser.add_argument('pages', nargs='?', help='Directory of saved .html pages')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus per backend')
+    parser.add_argument('--selectors', help='Comma-separated content selectors, highest priority first')
+    parser.add_argument('--check', action='store_true',
+                       help='Check that both backends give the same text and blocks, then exit')
+
+    args = parser.parse_args()
+    selectors = args.selectors.split(',') if args.selectors else None
+    if not (args.pages or args.check):
+        parser.error('provide a directory of pages or --check')
+
+    pages = []
+    if args.pages:
+        for path in sorted(glob.glob(os.path.join(args.pages, '*.htm*'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+        if not pages:
+            parser.error(f"No .html files found in {args.pages}")
+
+    if args.check:
+        pages = PARITY_PAGES + pages
+        mismatches = check_parity(pages, selectors)
+        for index, method, expected, actual in mismatches:
+            print(f"Page {index} {method}: bs4 {expected!r} != lxml {actual!r}")
+        print(f"Backends agree on {len(pages) - len({index for index, *_ in mismatches})} of {len(pages)} pages")
+        raise SystemExit(1 if mismatches else 0)
+
+    total_bytes = sum(len(html.encode('utf-8')) for html in pages)
+    print(f"{len(pages)} pages, {total_bytes / 1024 / 1024:.1f} MB")
+
+    results = benchmark(pages, repeat=args.repeat, selectors=selectors)
+    baseline = results['bs4']['seconds']
+    for backend, result in results.items():
+        print(f"{backend:5s} {result['seconds'] * 1000:9.1f} ms total, "
+              f"{result['seconds'] * 1000 / len(pages):7.2f} ms/page, "
+              f"{total_bytes / result['seconds'] / 1024 / 1024:7.1f} MB/s, "
+              f"{baseline / result['seconds']:5.1f}x vs bs4")
+
+    same = sum(a == b for a, b in zip(results['bs4']['texts'], results['lxml']['texts']))
+    print(f"Identical text on {same} of {len(pages)} pages")
+
+if __name__ == "__main__":
+    main()
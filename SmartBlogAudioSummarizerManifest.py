@@ -0,0 +1,290 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from SmartBlogAudioSummarizerCache import make_key
+
+"""
+Persistent job manifest for the Smart Blog Audio Summarizer scripts.
+
+The manifest (manifest.sqlite3 in the output directory) records, for every
+post, the hash of its extracted text and the state of each output stage:
+
+summary        summary.txt
+full_audio     full_post.mp3
+summary_audio  summary.mp3
+
+A stage is done when it finished for the same input and settings (its
+fingerprint, see stage_keys) and its file is still the one that was
+written, with the same size and modification time. Re-running a crawl
+therefore skips posts whose text has not changed, and a run that crashed
+halfway resumes from the first stage that had not finished: a summary
+that was written is read back instead of summarizing the post again.
+
+Files are written to a temporary name and renamed into place (atomic_write),
+so a crash never leaves a truncated output that looks complete.
+"""
+
+# Output file of each stage, in the order they run
+STAGES = {
+    'summary': 'summary.txt',
+    'full_audio': 'full_post.mp3',
+    'summary_audio': 'summary.mp3',
+}
+
+MANIFEST_NAME = 'manifest.sqlite3'
+
+
+def content_hash(text):
+    """
+    Hash a post's extracted text
+
+    Args:
+        text (str): Post content
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def stage_keys(content, summary_settings, audio_settings):
+    """
+    Fingerprint each stage's input and settings
+
+    Args:
+        content (str): Post content
+        summary_settings (dict): Everything that changes the summary (model, preset, lengths, ...)
+        audio_settings (dict): Everything that changes the audio (engine, voice, language, ...)
+
+    Returns:
+        dict: Fingerprint by stage name
+    """
+    return _stage_keys(content_hash(content), summary_settings, audio_settings)
+
+
+def _stage_keys(digest, summary_settings, audio_settings):
+    """stage_keys for a content hash"""
+    summary_key = make_key(digest, **summary_settings)
+    return {
+        'summary': summary_key,
+        'full_audio': make_key(digest, **audio_settings),
+        # The summary is determined by its own fingerprint, so it stands in for the summary text
+        'summary_audio': make_key(summary_key, **audio_settings),
+    }
+
+
+def atomic_write(path, data):
+    """
+    Write a file so that it is either complete or not there at all
+
+    Args:
+        path (str): Destination path
+        data (str or bytes): Contents; text is written as UTF-8
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+class Manifest:
+    def __init__(self, path):
+        """
+        Open (or create) a job manifest
+
+        Args:
+            path (str): Manifest database file (usually MANIFEST_NAME in the output directory)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS stages (
+                url TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                artifact TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (url, stage)
+            )
+        """)
+        self._db.commit()
+
+    def update_post(self, url, content, output_dir):
+        """
+        Record a post's current content hash and output directory
+
+        Args:
+            url (str): Post URL
+            content (str): Extracted text
+            output_dir (str): Directory its outputs are written to
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO posts (url, content_hash, output_dir, updated_at) VALUES (?, ?, ?, ?)",
+                (url, content_hash(content), output_dir, time.time()))
+            self._db.commit()
+
+    def completed(self, url, stage, key):
+        """
+        Check whether a stage finished for this input and its file is untouched
+
+        Args:
+            url (str): Post URL
+            stage (str): One of STAGES
+            key (str): The stage's fingerprint from stage_keys
+
+        Returns:
+            bool: True if the stage does not need to run again
+        """
+        return self._artifact(url, stage, key) is not None
+
+    def done_artifacts(self, url, summary_settings, audio_settings):
+        """
+        Find the finished outputs of a post's last recorded text under the given settings
+
+        Used to reuse a post's outputs for a near-duplicate: only stages that
+        completed for that text and these settings, with untouched files, count.
+
+        Args:
+            url (str): Post URL
+            summary_settings (dict): Everything that changes the summary, as for stage_keys
+            audio_settings (dict): Everything that changes the audio, as for stage_keys
+
+        Returns:
+            dict: Path of the file by stage name, for the stages that are done
+        """
+        with self._lock:
+            row = self._db.execute("SELECT content_hash FROM posts WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return {}
+        keys = _stage_keys(row[0], summary_settings, audio_settings)
+        artifacts = {stage: self._artifact(url, stage, keys[stage]) for stage in STAGES}
+        return {stage: path for stage, path in artifacts.items() if path is not None}
+
+    def pending(self, url, keys):
+        """
+        List the stages of a post that still have to run
+
+        Args:
+            url (str): Post URL
+            keys (dict): Fingerprint by stage name, from stage_keys
+
+        Returns:
+            list: Stage names, in STAGES order
+        """
+        return [stage for stage in STAGES if not self.completed(url, stage, keys[stage])]
+
+    def record(self, url, stage, key, artifact):
+        """
+        Mark a stage as done
+
+        Args:
+            url (str): Post URL
+            stage (str): One of STAGES
+            key (str): The stage's fingerprint
+            artifact (str): Path of the file the stage wrote
+        """
+        stat = os.stat(artifact)
+        self._set(url, stage, key, 'done', os.path.abspath(artifact), stat.st_size, stat.st_mtime_ns, None)
+
+    def fail(self, url, stage, key, error):
+        """
+        Mark a stage as failed so the next run retries it
+
+        Args:
+            url (str): Post URL
+            stage (str): One of STAGES
+            key (str): The stage's fingerprint
+            error (str): What went wrong
+        """
+        self._set(url, stage, key, 'failed', None, None, None, str(error))
+
+    @contextlib.contextmanager
+    def stage(self, url, stage, key, artifact):
+        """
+        Run a stage: record it as done when the block finishes, or as failed if it raises
+
+        Args:
+            url (str): Post URL
+            stage (str): One of STAGES
+            key (str): The stage's fingerprint
+            artifact (str): Path of the file the block writes
+        """
+        try:
+            yield
+        except Exception as e:
+            self.fail(url, stage, key, f"{type(e).__name__}: {e}")
+            raise
+        self.record(url, stage, key, artifact)
+
+    def status(self):
+        """
+        Count stages by state
+
+        Returns:
+            dict: Number of done and failed entries per stage name
+        """
+        counts = {stage: {'done': 0, 'failed': 0} for stage in STAGES}
+        with self._lock:
+            for stage, status, count in self._db.execute(
+                    "SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status"):
+                counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._db.close()
+
+    def _artifact(self, url, stage, key):
+        """The file of a stage that is done for this fingerprint and untouched since, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, status, artifact, size, mtime_ns FROM stages WHERE url = ? AND stage = ?",
+                (url, stage)).fetchone()
+        if row is None or row[0] != key or row[1] != 'done':
+            return None
+        try:
+            stat = os.stat(row[2])
+        except OSError:
+            return None
+        # Another post written to the same directory since then replaces the file
+        if stat.st_size != row[3] or stat.st_mtime_ns != row[4]:
+            return None
+        return row[2]
+
+    def _set(self, url, stage, key, status, artifact, size, mtime_ns, error):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stages (url, stage, key, status, artifact, size, mtime_ns, error, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, stage, key, status, artifact, size, mtime_ns, error, time.time()))
+            self._db.commit()
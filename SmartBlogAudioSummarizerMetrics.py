@@ -0,0 +1,150 @@
+import collections
+import contextlib
+import functools
+import json
+import sys
+import threading
+import time
+
+"""
+Structured per-stage metrics for the Smart Blog Audio Summarizer scripts.
+
+BlogEnhancer wraps its stages (fetch, parse, chunk, each model generate call,
+each TTS call and every file written) in Metrics spans. With --metrics PATH
+every span is written as one JSON line:
+
+{"ts": 1700000000.12, "span": "generate", "wall_s": 2.31, "thread": "MainThread",
+ "chunks": 8, "tokens_in": 7421, "tokens_out": 1103, "max_rss_mb": 1830.4}
+
+plus "error" records for failures that the scripts report and carry on
+from, and a final "summary" record with the count and total wall time of each
+span and the peak memory of the run. Use '-' as PATH for standard error.
+
+--profile PATH runs the summarization hot path (create_summaries) under
+cProfile and writes the stats to PATH; read them with
+python -m pstats PATH
+
+Metrics() with no path is disabled: spans cost one context manager and
+nothing is measured or written, so the enhancers always have one.
+"""
+
+
+def _max_rss_mb():
+    """Peak RSS of this process so far in MB, or None where unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def profiled(method):
+    """Decorate an enhancer method so it runs under its metrics' cProfile hook"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.profiled():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Metrics:
+    def __init__(self, path=None, profile_path=None):
+        """
+        Args:
+            path (str): JSON-lines output file, '-' for standard error, or None to disable
+            profile_path (str): Where to write cProfile stats for create_summaries, or None
+        """
+        self.path = path
+        self.enabled = path is not None
+        self.profile_path = profile_path
+        self._file = None
+        if path == '-':
+            self._file = sys.stderr
+        elif path is not None:
+            self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._totals = collections.defaultdict(lambda: [0, 0.0])
+        self._profiler = None
+        if profile_path is not None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+        self._profile_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """
+        Time a block of work and write it as one record
+
+        Args:
+            name (str): Stage name
+            **fields: Values known up front (e.g. url)
+
+        Yields:
+            dict: Fields to fill in during the block (e.g. bytes written)
+        """
+        if not self.enabled:
+            yield fields
+            return
+        started = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            with self._lock:
+                totals = self._totals[name]
+                totals[0] += 1
+                totals[1] += wall
+            self._write(dict(span=name, wall_s=round(wall, 6), **fields, max_rss_mb=_max_rss_mb()))
+
+    def event(self, name, **fields):
+        """Write a record without timing (e.g. an error the script carried on from)"""
+        if self.enabled:
+            self._write(dict(event=name, **fields))
+
+    @contextlib.contextmanager
+    def profiled(self):
+        """Run a block under cProfile when --profile is on (one block at a time)"""
+        # A profiler can only be active in one place; nested or concurrent calls run unprofiled
+        if self._profiler is None or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        self._profiler.enable()
+        try:
+            yield
+        finally:
+            self._profiler.disable()
+            self._profile_lock.release()
+
+    def summary(self):
+        """
+        Totals so far
+
+        Returns:
+            dict: Count and total wall seconds per span name
+        """
+        with self._lock:
+            return {name: {'count': count, 'total_s': round(total, 3)}
+                    for name, (count, total) in self._totals.items()}
+
+    def close(self):
+        """Write the summary record and the profile, and close the output"""
+        if self.enabled:
+            self._write({'event': 'summary', 'spans': self.summary(), 'max_rss_mb': _max_rss_mb()})
+            if self._file is not sys.stderr:
+                self._file.close()
+            self.enabled = False
+        if self._profiler is not None:
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+
+    def _write(self, record):
+        record = dict(ts=round(time.time(), 3), thread=threading.current_thread().name, **record)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
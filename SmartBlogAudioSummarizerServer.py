@@ -0,0 +1,506 @@
+import argparse
+import collections
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from SmartBlogAudioSummarizerBackends import BACKENDS, DEFAULT_PRESET, PRESETS, get_backend, get_preset
+from SmartBlogAudioSummarizerCache import DEFAULT_CACHE_DIR, AudioCache, SummaryCache
+from SmartBlogAudioSummarizerCrawl import BlogEnhancer
+from SmartBlogAudioSummarizerWorkers import SummaryWorkerPool, set_torch_threads
+
+"""
+Resident local service that keeps one BlogEnhancer (and its BART model) warm.
+
+Start the server:
+python SmartBlogAudioSummarizerServer.py --port 8765
+
+Endpoints (JSON in, JSON out):
+
+POST /summarize  {"text": "..."} or {"url": "..."}, optional max_length,
+                 min_length, reduce, target_length
+POST /audio      {"text": "...", "output_path": "out.mp3", "lang": "en"}
+POST /audio/stream  {"text": "...", "lang": "en"}, optional output_path;
+                 responds with audio/mpeg, sent segment by segment as it
+                 is synthesized (the connection closes at the end)
+GET  /stats      queue depth, batch sizes and latency percentiles (plus
+                 per-worker memory with --summary-workers)
+
+output_path is relative to --output-dir (default 'output'); absolute paths
+and '..' are rejected, so clients can only write inside that directory.
+Bodies that are not a JSON object, or lack the fields an endpoint needs,
+get a 400 response.
+
+Concurrent /summarize requests are coalesced into micro-batches: the batcher
+waits at most --max-wait-ms after the first queued request for others to
+arrive, then summarizes up to --max-batch posts in one create_summaries call.
+
+Use SummarizerClient from Python (or curl) to talk to a running server:
+
+client = SummarizerClient("http://127.0.0.1:8765")
+print(client.summarize("Your blog post content goes here."))
+"""
+
+
+class BadRequest(ValueError):
+    """A request body the server cannot act on, answered with HTTP 400"""
+
+
+def text_field(job, name, required=True):
+    """
+    Read a non-empty string field from a request body
+
+    Args:
+        job (dict): Parsed request body
+        name (str): Field name
+        required (bool): Whether a missing field is an error
+
+    Returns:
+        str: The field's value, or None if it is missing and not required
+    """
+    value = job.get(name)
+    if value is None:
+        if required:
+            raise BadRequest(f"Missing field: {name!r}")
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise BadRequest(f"Field {name!r} must be a non-empty string")
+    return value
+
+
+def summary_params(job):
+    """
+    Read the optional generation settings of a /summarize request
+
+    Args:
+        job (dict): Parsed request body
+
+    Returns:
+        dict: max_length, min_length and target_length as positive ints and reduce as a bool,
+            for the fields that were sent
+    """
+    params = {}
+    for name in ('max_length', 'min_length', 'target_length'):
+        value = job.get(name)
+        if value is None:
+            continue
+        # bool is an int subclass, but true/false is not a length
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise BadRequest(f"Field {name!r} must be a positive integer")
+        params[name] = value
+    if job.get('reduce') is not None:
+        if not isinstance(job['reduce'], bool):
+            raise BadRequest("Field 'reduce' must be true or false")
+        params['reduce'] = job['reduce']
+    return params
+
+
+def resolve_output_path(output_dir, output_path):
+    """
+    Place a client-supplied output path inside the server's output directory
+
+    Args:
+        output_dir (str): Directory the server may write audio to
+        output_path (str): Relative path sent by the client
+
+    Returns:
+        str: Absolute path inside output_dir, with its parent directories created
+    """
+    parts = output_path.replace('\\', '/').split('/')
+    if os.path.isabs(output_path) or os.path.splitdrive(output_path)[0] or '..' in parts:
+        raise BadRequest(f"output_path must be relative to the output directory without '..': {output_path!r}")
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, output_path))
+    # Catches symlinks inside the output directory that point out of it
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise BadRequest(f"output_path must name a file inside the output directory: {output_path!r}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class LatencyTracker:
+    def __init__(self, window=1000):
+        """
+        Keep the most recent latencies for each operation
+
+        Args:
+            window (int): Number of recent samples kept per operation
+        """
+        self.window = window
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds):
+        """Record one latency sample for an operation"""
+        with self._lock:
+            self._samples[operation].append(seconds)
+            self._counts[operation] += 1
+
+    def summary(self):
+        """
+        Report latency percentiles
+
+        Returns:
+            dict: Count and p50/p95/p99 latency in milliseconds per operation
+        """
+        with self._lock:
+            samples = {operation: sorted(values) for operation, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {operation: {'count': counts[operation],
+                            'p50_ms': _percentile(values, 50),
+                            'p95_ms': _percentile(values, 95),
+                            'p99_ms': _percentile(values, 99)}
+                for operation, values in samples.items()}
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of sorted latencies in seconds, returned in milliseconds"""
+    if not sorted_values:
+        return None
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return round(sorted_values[int(index)] * 1000, 2)
+
+
+class MicroBatcher:
+    def __init__(self, enhancer, max_batch=16, max_wait=0.05, latencies=None):
+        """
+        Coalesce concurrent summarization requests into batched model calls
+
+        Args:
+            enhancer (BlogEnhancer): Enhancer whose create_summaries does the work
+            max_batch (int): Maximum number of posts per batch
+            max_wait (float): Seconds to wait for more requests after the first one
+            latencies (LatencyTracker): Where to record end-to-end request latency
+        """
+        self.enhancer = enhancer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.latencies = latencies or LatencyTracker()
+        self.batches = 0
+        self.batched_posts = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='summary-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, text, max_length=150, min_length=50, reduce=False, target_length=None):
+        """
+        Queue a post for summarization
+
+        Returns:
+            Future: Resolves to the summary text
+        """
+        future = Future()
+        params = (max_length, min_length, reduce, target_length)
+        self._queue.put((params, text, future, time.perf_counter()))
+        return future
+
+    def summarize(self, text, **params):
+        """Queue a post and wait for its summary"""
+        return self.submit(text, **params).result()
+
+    def _run(self):
+        """Collect queued requests until the batch is full or the deadline passes, then run them"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Requests with different length settings cannot share a create_summaries call
+            groups = collections.defaultdict(list)
+            for job in batch:
+                try:
+                    groups[job[0]].append(job)
+                except TypeError as e:
+                    job[2].set_exception(e)
+            for params, jobs in groups.items():
+                try:
+                    self._run_group(params, jobs)
+                except Exception as e:
+                    # A bad group fails its own requests, never the batcher thread
+                    for _, _, future, _ in jobs:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _run_group(self, params, jobs):
+        """Summarize one group of requests that share generation settings"""
+        try:
+            summaries = self.enhancer.create_summaries([job[1] for job in jobs], *params)
+        except Exception as e:
+            for _, _, future, _ in jobs:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_posts += len(jobs)
+        now = time.perf_counter()
+        for (_, _, future, submitted), summary in zip(jobs, summaries):
+            self.latencies.record('summarize', now - submitted)
+            future.set_result(summary)
+
+    def stats(self):
+        """
+        Report queue depth and batching behaviour
+
+        Returns:
+            dict: Queue depth, number of batches and mean posts per batch
+        """
+        return {'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'mean_batch_size': round(self.batched_posts / self.batches, 2) if self.batches else None}
+
+
+class SummarizerHandler(BaseHTTPRequestHandler):
+    # Set by serve() before the server starts
+    enhancer = None
+    batcher = None
+    latencies = None
+    output_dir = None
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        stats = self.batcher.stats()
+        stats['latency'] = self.latencies.summary()
+        if self.enhancer.worker_pool is not None:
+            stats['memory'] = self.enhancer.worker_pool.memory()
+        self._send_json(200, stats)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid JSON body: {str(e)}"})
+            return
+        if not isinstance(job, dict):
+            self._send_json(400, {'error': "Request body must be a JSON object"})
+            return
+
+        if self.path == '/audio/stream':
+            self._stream_audio(job)
+            return
+
+        handlers = {'/summarize': self._summarize, '/audio': self._audio}
+        handler = handlers.get(self.path)
+        if handler is None:
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+
+        try:
+            self._send_json(200, handler(job))
+        except BadRequest as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def _summarize(self, job):
+        """Summarize posted text, or the content of a posted URL"""
+        params = summary_params(job)
+        text = text_field(job, 'text', required=False)
+        if text is None:
+            url = text_field(job, 'url', required=False)
+            if url is None:
+                raise BadRequest("Send either 'text' or 'url'")
+            text = self.enhancer.extract_content_from_url(url)
+        return {'summary': self.batcher.summarize(text, **params)}
+
+    def _audio(self, job):
+        """Synthesize posted text to an MP3 file on the server's disk"""
+        started = time.perf_counter()
+        text = text_field(job, 'text')
+        output_path = resolve_output_path(self.output_dir, text_field(job, 'output_path'))
+        path = self.enhancer.create_audio(text, output_path, text_field(job, 'lang', required=False) or 'en')
+        self.latencies.record('audio', time.perf_counter() - started)
+        return {'output_path': path}
+
+    def _stream_audio(self, job):
+        """Send audio for posted text as each segment is synthesized"""
+        started = time.perf_counter()
+        try:
+            text = text_field(job, 'text')
+            output_path = text_field(job, 'output_path', required=False)
+            if output_path is not None:
+                output_path = resolve_output_path(self.output_dir, output_path)
+            lang = text_field(job, 'lang', required=False) or 'en'
+        except BadRequest as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        try:
+            stream = self.enhancer.stream_audio(text, output_path, lang)
+            # Synthesize the first segment before committing to a 200 response
+            first = next(stream)
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self.latencies.record('audio_first_byte', time.perf_counter() - started)
+        # No Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.end_headers()
+        try:
+            for frames in itertools.chain([first], stream):
+                self.wfile.write(frames)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Listener went away; closing the generator stops the remaining segments
+            stream.close()
+            return
+        self.latencies.record('audio_stream', time.perf_counter() - started)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep request logging out of the way of the stats endpoint
+        pass
+
+
+def serve(enhancer, host='127.0.0.1', port=8765, max_batch=16, max_wait=0.05, output_dir='output'):
+    """
+    Create a server around a warm BlogEnhancer
+
+    Args:
+        enhancer (BlogEnhancer): Enhancer shared by all requests
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+        max_batch (int): Maximum posts per summarization batch
+        max_wait (float): Seconds to wait for more requests after the first one
+        output_dir (str): The only directory /audio requests may write to
+
+    Returns:
+        ThreadingHTTPServer: Server ready for serve_forever()
+    """
+    latencies = LatencyTracker()
+    handler = type('BoundSummarizerHandler', (SummarizerHandler,), {
+        'enhancer': enhancer,
+        'batcher': MicroBatcher(enhancer, max_batch, max_wait, latencies),
+        'latencies': latencies,
+        'output_dir': os.path.abspath(output_dir),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class SummarizerClient:
+    def __init__(self, base_url='http://127.0.0.1:8765', timeout=600):
+        """
+        Minimal client for a running summarizer server
+
+        Args:
+            base_url (str): Server address
+            timeout (float): Seconds to wait for each response
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def summarize(self, text=None, url=None, **params):
+        """Summarize text (or the content of a URL) and return the summary"""
+        job = dict(params, **({'text': text} if text is not None else {'url': url}))
+        return self._request('/summarize', job)['summary']
+
+    def audio(self, text, output_path, lang='en'):
+        """Synthesize text to an MP3 under the server's output directory and return its path"""
+        return self._request('/audio', {'text': text, 'output_path': output_path, 'lang': lang})['output_path']
+
+    def stream_audio(self, text, lang='en', output_path=None, chunk_size=8192):
+        """Synthesize text and yield MP3 bytes as the server sends them"""
+        job = {'text': text, 'lang': lang}
+        if output_path is not None:
+            job['output_path'] = output_path
+        request = urllib.request.Request(self.base_url + '/audio/stream', data=json.dumps(job).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            while True:
+                data = response.read1(chunk_size)
+                if not data:
+                    break
+                yield data
+
+    def stats(self):
+        """Fetch queue depth and latency percentiles"""
+        return self._request('/stats')
+
+    def _request(self, path, job=None):
+        data = json.dumps(job).encode('utf-8') if job is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve summaries and audio from a warm BlogEnhancer')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to bind')
+    parser.add_argument('--max-batch', type=int, default=16,
+                       help='Maximum number of posts summarized together')
+    parser.add_argument('--max-wait-ms', type=float, default=50,
+                       help='How long to wait for more requests before running a batch')
+    parser.add_argument('--backend', default='bart', choices=list(BACKENDS),
+                       help='Summarization model backend (distilled, int8-quantized or ONNX for speed)')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                       help='Generation speed/quality preset: beams, length penalty and summary budgets')
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Number of text chunks summarized per model call')
+    parser.add_argument('--summary-workers', type=int, default=1,
+                       help='Worker processes running the summarization model')
+    parser.add_argument('--torch-threads', type=int,
+                       help='Torch threads per summarization process (default: cores / workers)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help='Directory for the on-disk summary and audio caches')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the summary and audio caches')
+    parser.add_argument('--output-dir', default='output',
+                       help='Directory audio requests write to; their output_path is relative to it')
+
+    args = parser.parse_args()
+
+    summary_cache = None
+    audio_cache = None
+    if not args.no_cache:
+        summary_cache = SummaryCache(args.cache_dir)
+        audio_cache = AudioCache(args.cache_dir)
+
+    enhancer = BlogEnhancer(batch_size=args.batch_size,
+                            backend=get_backend(args.backend),
+                            preset=get_preset(args.preset),
+                            summary_cache=summary_cache,
+                            audio_cache=audio_cache)
+    # Load the model now so the first request does not pay for it
+    enhancer.summarizer
+    if args.summary_workers > 1:
+        enhancer.worker_pool = SummaryWorkerPool(enhancer, args.summary_workers, args.torch_threads)
+    elif args.torch_threads:
+        set_torch_threads(args.torch_threads)
+
+    server = serve(enhancer, args.host, args.port, args.max_batch, args.max_wait_ms / 1000, args.output_dir)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if enhancer.worker_pool is not None:
+            enhancer.worker_pool.close()
+
+if __name__ == "__main__":
+    main()
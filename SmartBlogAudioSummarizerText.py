@@ -0,0 +1,170 @@
+import array
+import functools
+import hashlib
+import os
+
+"""
+Text helpers shared by the Smart Blog Audio Summarizer scripts.
+
+NLTK is only imported the first time sentences are needed, and the Punkt
+sentence tokenizer is loaded from a local data directory; it is downloaded
+into that directory only when it is genuinely missing, instead of calling
+nltk.download() on every run.
+
+Set NLTK_DATA to use a different data directory (e.g. one baked into a
+container image for cron jobs without network access).
+
+A post's text is split into sentences once: get_document() returns a
+Document holding the sentence offsets into the original string and a hash
+of every sentence, in flat arrays. Chunking, audio segmentation and the
+cache keys all read from it, so a page goes through Punkt once however many
+stages look at it. The text they pass on is a Passage: a single slice of
+the original string that carries the hash of its sentences as its cache key.
+"""
+
+NLTK_DATA_DIR = os.environ.get("NLTK_DATA", os.path.join(os.path.expanduser("~"), "nltk_data"))
+
+# Bytes of each per-sentence hash
+DIGEST_SIZE = 16
+# Documents kept for reuse, e.g. between summarizing a post and voicing it
+DOCUMENT_CACHE_SIZE = 64
+
+_punkt_ready = False
+_punkt_tokenizer = None
+
+
+def ensure_punkt():
+    """Make sure the Punkt tokenizer data is available, downloading it only if missing"""
+    global _punkt_ready
+    if _punkt_ready:
+        return
+
+    import nltk
+    from nltk.tokenize import punkt
+
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    # NLTK 3.8.2+ loads the pickle-free "punkt_tab" resource instead of "punkt"
+    resource = 'punkt_tab' if hasattr(punkt, 'PunktTokenizer') else 'punkt'
+    try:
+        nltk.data.find(f'tokenizers/{resource}')
+    except LookupError:
+        nltk.download(resource, download_dir=NLTK_DATA_DIR, quiet=True)
+        try:
+            nltk.data.find(f'tokenizers/{resource}')
+        except LookupError:
+            # Not marked ready, so the next call tries the download again
+            raise LookupError(f"NLTK's {resource} tokenizer data is missing and could not be downloaded; "
+                              f"run: python -m nltk.downloader -d {NLTK_DATA_DIR} {resource}") from None
+    _punkt_ready = True
+
+
+def sentence_spans(text):
+    """
+    Find sentence boundaries with NLTK's Punkt tokenizer
+
+    Args:
+        text (str): Text to split
+
+    Returns:
+        iterator: (start, end) character offsets of each sentence
+    """
+    global _punkt_tokenizer
+    if _punkt_tokenizer is None:
+        ensure_punkt()
+        from nltk.tokenize import punkt
+
+        if hasattr(punkt, 'PunktTokenizer'):
+            _punkt_tokenizer = punkt.PunktTokenizer('english')
+        else:
+            import nltk
+            _punkt_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+    return _punkt_tokenizer.span_tokenize(text)
+
+
+def sent_tokenize(text):
+    """
+    Split text into sentences with NLTK's Punkt tokenizer
+
+    Args:
+        text (str): Text to split
+
+    Returns:
+        list: List of sentences
+    """
+    return list(get_document(text))
+
+
+class Passage(str):
+    """A piece of a Document's text; key hashes its sentences, or is None for partial sentences"""
+    key = None
+
+
+def content_key(text):
+    """The sentence hash of a Passage, or the text itself, for use in cache keys"""
+    return getattr(text, 'key', None) or text
+
+
+class Document:
+    def __init__(self, text):
+        """
+        Split text into sentences once, keeping offsets and hashes instead of copies
+
+        Args:
+            text (str): Text to index
+        """
+        self.text = text
+        self.starts = array.array('q')
+        self.ends = array.array('q')
+        digests = bytearray()
+        for start, end in sentence_spans(text):
+            self.starts.append(start)
+            self.ends.append(end)
+            digests += hashlib.blake2b(text[start:end].encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+        self.digests = bytes(digests)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.sentence(index)
+
+    def sentence(self, index):
+        """The text of one sentence"""
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def digest(self, index):
+        """The hash of one sentence"""
+        return self.digests[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE]
+
+    def passage(self, first, last):
+        """
+        Sentences first to last - 1 as one slice of the text
+
+        Args:
+            first (int): Index of the first sentence
+            last (int): Index after the last sentence
+
+        Returns:
+            Passage: The text, keyed by the hashes of its sentences
+        """
+        passage = Passage(self.text[self.starts[first]:self.ends[last - 1]])
+        passage.key = hashlib.blake2b(memoryview(self.digests)[first * DIGEST_SIZE:last * DIGEST_SIZE],
+                                      digest_size=DIGEST_SIZE).hexdigest()
+        return passage
+
+
+@functools.lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def get_document(text):
+    """
+    The Document for a text, built on first use and then shared
+
+    Args:
+        text (str): Text to index
+
+    Returns:
+        Document: The sentence index
+    """
+    return Document(text)
@@ -0,0 +1,242 @@
+import contextlib
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from SmartBlogAudioSummarizerMetrics import Metrics
+
+"""
+Compact audio renditions for the Smart Blog Audio Summarizer scripts.
+
+The TTS engines return 24 kHz MP3 at a bitrate chosen for quality, not
+size, and full-post files of long articles add up. With --audio-profile
+every audio file a run writes (full_post.mp3 and summary.mp3) is also
+encoded into the chosen profiles, loudness-normalized to the -16 LUFS
+podcast target, next to the original:
+
+summary.mp3  ->  summary.mono-48k.mp3, summary.opus-24k.opus
+
+Encoding is done by ffmpeg (which must be on the PATH) in the background
+while the run goes on with the next post, several files at a time; the
+scripts wait for the queue at the end of the run. ffmpeg runs as a child
+process, so a thread per job is enough to keep every core busy.
+"""
+
+# EBU R128 loudness normalization to the usual speech/podcast target
+LOUDNORM = 'loudnorm=I=-16:TP=-1.5:LRA=11'
+
+
+class AudioProfile:
+    def __init__(self, name, codec, extension, container, bitrate, sample_rate, channels=1, codec_args=()):
+        """
+        Args:
+            name (str): Profile name, also used in the rendition's file name
+            codec (str): ffmpeg audio encoder (libmp3lame, libopus)
+            extension (str): File extension of the rendition
+            container (str): ffmpeg output format
+            bitrate (str): Target bitrate (e.g. '48k')
+            sample_rate (int): Output sample rate in Hz
+            channels (int): Output channels (1 is mono)
+            codec_args (tuple): Extra encoder options
+        """
+        self.name = name
+        self.codec = codec
+        self.extension = extension
+        self.container = container
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.codec_args = tuple(codec_args)
+
+    @property
+    def params(self):
+        """Everything about the profile that changes its output, for manifest keys"""
+        return {
+            'codec': self.codec,
+            'container': self.container,
+            'bitrate': self.bitrate,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'codec_args': list(self.codec_args),
+            'filter': LOUDNORM,
+        }
+
+    def ffmpeg_args(self, source, destination):
+        """
+        Build the ffmpeg command line (without the executable) for one rendition
+
+        Args:
+            source (str): Audio file to encode
+            destination (str): Where to write the rendition
+
+        Returns:
+            list: Command-line arguments
+        """
+        return ['-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', source, '-vn',
+                '-af', LOUDNORM, '-ac', str(self.channels), '-ar', str(self.sample_rate),
+                '-c:a', self.codec, '-b:a', self.bitrate, *self.codec_args,
+                '-f', self.container, destination]
+
+
+# Opus is tuned for speech (-application voip) and plays in every current
+# browser; the MP3 profiles are for players that only take MP3
+PROFILES = {profile.name: profile for profile in (
+    AudioProfile('mono-64k', 'libmp3lame', 'mp3', 'mp3', '64k', 44100),
+    AudioProfile('mono-48k', 'libmp3lame', 'mp3', 'mp3', '48k', 24000),
+    AudioProfile('mono-32k', 'libmp3lame', 'mp3', 'mp3', '32k', 22050),
+    AudioProfile('opus-32k', 'libopus', 'opus', 'ogg', '32k', 48000, codec_args=('-application', 'voip')),
+    AudioProfile('opus-24k', 'libopus', 'opus', 'ogg', '24k', 48000, codec_args=('-application', 'voip')),
+)}
+
+
+def get_profiles(names):
+    """
+    Look up audio output profiles
+
+    Args:
+        names (str): Comma-separated names from PROFILES
+
+    Returns:
+        list: AudioProfile objects, in the order given
+    """
+    profiles = []
+    for name in dict.fromkeys(name.strip() for name in names.split(',') if name.strip()):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown audio profile: {name!r}")
+        profiles.append(PROFILES[name])
+    return profiles
+
+
+def rendition_path(source, profile):
+    """
+    Path of an audio file's rendition in a profile
+
+    Args:
+        source (str): Original audio file (e.g. output/summary.mp3)
+        profile (AudioProfile): Output profile
+
+    Returns:
+        str: e.g. output/summary.opus-24k.opus
+    """
+    stem = os.path.splitext(source)[0]
+    return f"{stem}.{profile.name}.{profile.extension}"
+
+
+class Transcoder:
+    def __init__(self, profiles, workers=None, metrics=None, ffmpeg='ffmpeg'):
+        """
+        Start a background transcoding queue
+
+        Args:
+            profiles (list): AudioProfile objects every submitted file is encoded into
+            workers (int): Files encoded at once (default: one per core)
+            metrics (Metrics): Where 'transcode' spans are recorded
+            ffmpeg (str): ffmpeg executable name or path
+        """
+        self.executable = shutil.which(ffmpeg)
+        if self.executable is None:
+            raise RuntimeError(f"{ffmpeg} not found; install ffmpeg to use audio profiles")
+        self.profiles = profiles
+        self.metrics = metrics or Metrics()
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                        thread_name_prefix='transcode')
+        self._lock = threading.Lock()
+        self._futures = []
+        self._stats = {'renditions': 0, 'failed': 0, 'source_bytes': 0, 'bytes': 0}
+
+    def submit(self, source, profiles=None, callback=None):
+        """
+        Queue renditions of an audio file and return right away
+
+        Args:
+            source (str): Audio file, complete on disk
+            profiles (list): Profiles to encode into (default: all of self.profiles)
+            callback (callable): Called as callback(profile, path, error) from a pool
+                thread when each rendition is written (error None) or has failed
+        """
+        for profile in self.profiles if profiles is None else profiles:
+            future = self._pool.submit(self._run, source, profile, callback)
+            with self._lock:
+                self._futures.append(future)
+
+    def _run(self, source, profile, callback):
+        # The callback runs inside the job, so wait() also waits for it
+        try:
+            path = self.transcode(source, profile)
+        except Exception as e:
+            if callback is None:
+                raise
+            callback(profile, rendition_path(source, profile), e)
+        else:
+            if callback is not None:
+                callback(profile, path, None)
+
+    def transcode(self, source, profile):
+        """
+        Encode one rendition, written atomically next to the source
+
+        Args:
+            source (str): Audio file to encode
+            profile (AudioProfile): Output profile
+
+        Returns:
+            str: Path of the rendition
+        """
+        destination = rendition_path(source, profile)
+        temp_path = f"{destination}.{threading.get_ident()}.part"
+        with self.metrics.span('transcode', path=destination, profile=profile.name) as span:
+            try:
+                source_bytes = span['bytes_in'] = os.path.getsize(source)
+                result = subprocess.run([self.executable, *profile.ffmpeg_args(source, temp_path)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                if result.returncode != 0:
+                    error = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+                    raise RuntimeError(f"ffmpeg: {error[-1] if error else f'exit status {result.returncode}'}")
+                os.replace(temp_path, destination)
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(temp_path)
+                with self._lock:
+                    self._stats['failed'] += 1
+                raise
+            size = os.path.getsize(destination)
+            span['bytes'] = size
+        with self._lock:
+            self._stats['renditions'] += 1
+            self._stats['source_bytes'] += source_bytes
+            self._stats['bytes'] += size
+        return destination
+
+    def wait(self):
+        """
+        Wait for everything queued so far
+
+        Returns:
+            dict: Renditions written and failed, and the bytes of their sources and of the renditions
+        """
+        while True:
+            with self._lock:
+                futures, self._futures = self._futures, []
+            if not futures:
+                break
+            for future in futures:
+                # Failures are reported through the callback and counted in the stats
+                future.exception()
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        """Finish the queued work and stop the pool"""
+        self._pool.shutdown(wait=True)
+
+
+def format_renditions(stats):
+    """Format a Transcoder.wait() report for printing"""
+    line = f"Transcoded {stats['renditions']} renditions"
+    if stats['source_bytes']:
+        line += (f" ({stats['bytes'] / 1024 / 1024:.1f} MB from {stats['source_bytes'] / 1024 / 1024:.1f} MB"
+                 f" of originals, {100 * stats['bytes'] / stats['source_bytes']:.0f}%)")
+    if stats['failed']:
+        line += f", {stats['failed']} failed"
+    return line
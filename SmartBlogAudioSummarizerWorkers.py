@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import queue
+import threading
+from SmartBlogAudioSummarizerMetrics import Metrics
+
+"""
+Multi-process summarization for the Smart Blog Audio Summarizer scripts.
+
+A single Python process leaves most cores of a large machine idle, because
+torch's intra-op threads stop scaling long before 32 cores. SummaryWorkerPool
+runs N worker processes that each own a model and a slice of the cores:
+
+- The model is loaded once in the parent and its weights are moved to shared
+  memory before the workers are forked, so every worker maps the same
+  physical pages instead of holding its own copy. (Where fork is unavailable
+  the workers are spawned and load their own model.)
+- Each worker gets cpu_count // workers torch threads unless told otherwise.
+- Chunks are assigned longest-first to the worker with the least queued
+  tokens, so every worker finishes at about the same time.
+
+The enhancer keeps doing cache lookups and chunking in the parent; only the
+model calls are sent to the workers. memory() reports what each worker
+really costs (proportional and private set sizes from /proc), so the worker
+count can be raised until memory, not CPU, is the limit.
+"""
+
+
+def set_torch_threads(threads):
+    """
+    Limit the threads torch uses in this process
+
+    Args:
+        threads (int): Intra-op threads; inter-op parallelism is set to 1
+    """
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel op in this process
+        pass
+
+
+def _worker_main(source, torch_threads, tasks, results):
+    """Worker process loop: summarize each task's chunks and send the summaries back"""
+    # The parent's tokenizer may already have used its thread pool
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    if isinstance(source, tuple):
+        # Spawned: build our own enhancer and model
+        enhancer_class, kwargs = source
+        enhancer = enhancer_class(**kwargs)
+    else:
+        enhancer = source
+    # Only this worker's copy changes: no shared SQLite handles, no recursion
+    enhancer.summary_cache = None
+    enhancer.worker_pool = None
+    # The parent records the pool's generate spans
+    enhancer.metrics = Metrics()
+    set_torch_threads(torch_threads)
+    enhancer.summarizer
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, chunks, max_length, min_length = task
+        try:
+            results.put((job_id, enhancer._summarize_chunks(chunks, max_length, min_length), None))
+        except Exception as e:
+            results.put((job_id, None, f"{type(e).__name__}: {e}"))
+
+
+def balance(lengths, workers):
+    """
+    Assign items to workers so each gets about the same total length
+
+    Args:
+        lengths (list): Cost of each item (e.g. token count)
+        workers (int): Number of workers
+
+    Returns:
+        list: One list of item indices per worker
+    """
+    buckets = [[] for _ in range(workers)]
+    loads = [0] * workers
+    # Longest first: the big items are placed while there is still room to even out
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        target = loads.index(min(loads))
+        buckets[target].append(i)
+        loads[target] += lengths[i]
+    return buckets
+
+
+class SummaryWorkerPool:
+    def __init__(self, enhancer, workers=2, torch_threads=None):
+        """
+        Start worker processes that run the summarization model
+
+        Args:
+            enhancer (BlogEnhancer): Enhancer whose model the workers use
+            workers (int): Number of worker processes
+            torch_threads (int): Torch threads per worker (default: cpu_count // workers)
+        """
+        self.workers = workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.tokenizer = enhancer.summarizer.tokenizer
+        self._lock = threading.Lock()
+        self._job_id = 0
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            # Fork after the weights are in shared memory so all workers map one copy
+            # (ONNX Runtime models have no torch weights; fork still shares them copy-on-write)
+            model = enhancer.summarizer.model
+            if hasattr(model, 'share_memory'):
+                model.share_memory()
+            source = enhancer
+        else:
+            context = multiprocessing.get_context('spawn')
+            source = (type(enhancer), {'batch_size': enhancer.batch_size, 'backend': enhancer.backend,
+                                       'preset': enhancer.preset})
+
+        self._tasks = [context.Queue() for _ in range(workers)]
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_worker_main, name=f'summary-worker-{index}', daemon=True,
+                            args=(source, self.torch_threads, self._tasks[index], self._results))
+            for index in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+    def summarize(self, chunks, max_length, min_length):
+        """
+        Summarize chunks across the workers
+
+        Args:
+            chunks (list): Text chunks that fit the model's input window
+            max_length (int): Maximum length of each chunk summary
+            min_length (int): Minimum length of each chunk summary
+
+        Returns:
+            list: Summary of each chunk, in input order
+        """
+        if not chunks:
+            return []
+        lengths = [len(ids) for ids in self.tokenizer(chunks)['input_ids']]
+        summaries = [None] * len(chunks)
+
+        with self._lock:
+            jobs = {}
+            for worker, bucket in enumerate(balance(lengths, self.workers)):
+                if not bucket:
+                    continue
+                self._job_id += 1
+                jobs[self._job_id] = bucket
+                self._tasks[worker].put((self._job_id, [chunks[i] for i in bucket], max_length, min_length))
+
+            errors = []
+            while jobs:
+                try:
+                    job_id, results, error = self._results.get(timeout=1)
+                except queue.Empty:
+                    dead = [process for process in self._processes if not process.is_alive()]
+                    if dead:
+                        raise RuntimeError(f"Summary worker {dead[0].name} exited with code {dead[0].exitcode}")
+                    continue
+                # Wait for every job even after a failure, so no stale results are left queued
+                bucket = jobs.pop(job_id)
+                if error is not None:
+                    errors.append(error)
+                    continue
+                for i, summary in zip(bucket, results):
+                    summaries[i] = summary
+
+        if errors:
+            raise RuntimeError(f"Summary worker failed: {errors[0]}")
+        return summaries
+
+    def memory(self):
+        """
+        Report the memory used by the parent and each worker
+
+        Returns:
+            dict: Per-process RSS, PSS and private MB, the mean private MB an
+                extra worker costs and how many more would fit in available memory
+        """
+        processes = [('parent', os.getpid())] + [(process.name, process.pid) for process in self._processes]
+        report = {name: _process_memory(pid) for name, pid in processes}
+        private = [report[process.name]['private_mb'] for process in self._processes
+                   if report[process.name].get('private_mb') is not None]
+        available = _available_mb()
+        report['per_worker_mb'] = round(sum(private) / len(private), 1) if private else None
+        if report['per_worker_mb'] and available is not None:
+            report['more_workers_fit'] = int(available // report['per_worker_mb'])
+        return report
+
+    def close(self):
+        """Stop the workers"""
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+
+def _process_memory(pid):
+    """Read a process's RSS, PSS and private memory in MB from /proc (Linux only)"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        if pid == os.getpid():
+            import resource
+
+            # ru_maxrss is in kB on Linux and bytes on macOS; only the peak is available
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return {'peak_rss_mb': round(peak / 1024, 1)}
+        return {}
+    return {
+        'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+        'private_mb': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def _available_mb():
+    """Memory available for new processes in MB, or None if unknown"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def format_memory(report):
+    """Format a SummaryWorkerPool.memory() report for printing"""
+    lines = []
+    for name, usage in report.items():
+        if isinstance(usage, dict) and 'rss_mb' in usage:
+            lines.append(f"{name}: {usage['rss_mb']} MB RSS, {usage['pss_mb']} MB PSS, "
+                         f"{usage['private_mb']} MB private")
+    if report.get('per_worker_mb') is not None:
+        line = f"Each extra worker costs about {report['per_worker_mb']} MB"
+        if 'more_workers_fit' in report:
+            line += f"; memory for about {report['more_workers_fit']} more"
+        lines.append(line)
+    return "\n".join(lines)